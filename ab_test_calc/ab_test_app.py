@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
 from ab_test_calculator import ABTestCalculator
+from job_helpers import job_panel, run_job
+from perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="A/B Test Calculator", layout="centered")
 st.title("📊 A/B Test Calculator")
+init_perf("ab_test")
 
 st.markdown("Upload your CSV or manually input data for A/B testing.")
 
@@ -17,6 +20,20 @@ with st.sidebar:
 
 calc = ABTestCalculator(alpha=alpha, delta=delta, method=method, alternative=alternative)
 
+
+def _analyze(settings, n_A, conv_A, n_B, conv_B):
+    worker = ABTestCalculator(**settings)
+    return worker.analyze(n_A, conv_A, n_B, conv_B), worker.bs_diffs
+
+
+def analyze_shared(calc, n_A, conv_A, n_B, conv_B):
+    # Bootstrap and Bayesian sampling run through the shared queue; identical inputs from any session hit the cache
+    settings = dict(alpha=calc.alpha, delta=calc.delta, method=calc.method, alternative=calc.alternative,
+                    bootstrap_iter=calc.bootstrap_iter, bayes_iter=calc.bayes_iter)
+    calc.results, calc.bs_diffs = run_job("ab_analyze", _analyze, settings, n_A, conv_A, n_B, conv_B)
+    return calc.results
+
+
 # Input block
 option = st.radio("Input Method", ["Manual", "Upload CSV"])
 
@@ -30,25 +47,29 @@ if option == "Manual":
         conv_B = st.number_input("Conversions in Group B", min_value=0, value=138)
 
     if st.button("Run Test"):
-        results = calc.analyze(n_A, conv_A, n_B, conv_B)
-        st.success("Test completed.")
-        st.code(calc.summarize(), language="markdown")
-        if method == "bootstrap":
-            calc.plot_bootstrap()
-            st.pyplot()
+        with stage("compute: analyze"):
+            results = analyze_shared(calc, n_A, conv_A, n_B, conv_B)
+        with stage("render: summary"):
+            st.success("Test completed.")
+            st.code(calc.summarize(), language="markdown")
+            if method == "bootstrap":
+                calc.plot_bootstrap()
+                st.pyplot()
 
 else:
     uploaded_file = st.file_uploader("Upload CSV file", type=["csv", "xlsx"])
     if uploaded_file is not None:
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        with stage("load: file"):
+            if uploaded_file.name.endswith(".csv"):
+                df = pd.read_csv(uploaded_file)
+            else:
+                df = pd.read_excel(uploaded_file)
 
         st.write("### Preview", df.head())
 
         try:
-            calc.from_dataframe(df)
+            with stage("compute: analyze"):
+                calc.from_dataframe(df)
             st.success("Test completed from CSV.")
             st.code(calc.summarize(), language="markdown")
             if method == "bootstrap":
@@ -56,3 +77,6 @@ else:
                 st.pyplot()
         except Exception as e:
             st.error(f"Error analyzing file: {e}")
+
+job_panel()
+perf_panel()
@@ -1,7 +1,6 @@
 import numpy as np
-import pandas as pd
-import scipy.stats as stats
-import matplotlib.pyplot as plt
+# ndtr/ndtri are norm.cdf/norm.ppf without the import cost of scipy.stats
+from scipy.special import ndtr, ndtri
 
 class ABTestCalculator:
     def __init__(self, alpha=0.05, bootstrap_iter=5000, bayes_iter=10000, alternative='two-sided', delta=0.0, method='z_test'):
@@ -31,15 +30,15 @@ class ABTestCalculator:
         z_score = uplift / se
 
         if self.alternative == 'two-sided':
-            p_value = 2 * (1 - stats.norm.cdf(abs(z_score)))
+            p_value = 2 * (1 - ndtr(abs(z_score)))
         elif self.alternative == 'greater':
-            p_value = 1 - stats.norm.cdf(z_score)
+            p_value = 1 - ndtr(z_score)
         elif self.alternative == 'less':
-            p_value = stats.norm.cdf(z_score)
+            p_value = ndtr(z_score)
         else:
             raise ValueError("Invalid alternative hypothesis")
 
-        z_crit = stats.norm.ppf(1 - self.alpha / 2)
+        z_crit = ndtri(1 - self.alpha / 2)
         ci_z = [uplift - z_crit * se, uplift + z_crit * se]
         significant = (p_value < self.alpha) and (abs(uplift) >= self.delta)
 
@@ -117,6 +116,8 @@ class ABTestCalculator:
         return summary
 
     def plot_bootstrap(self):
+        import matplotlib.pyplot as plt
+
         if not hasattr(self, 'bs_diffs'):
             raise ValueError("Run analyze() before plotting.")
         ci = self.results['bootstrap']['ci']
@@ -0,0 +1,128 @@
+# benchmarks/bench.py
+# Бенчмарки горячих путей: время (лучший из повторов) и пиковая память (tracemalloc) на каждый случай.
+# Результаты сравниваются с JSON-базой в benchmarks/baselines/<scale>.json; регрессия — код выхода 1.
+#
+#   python benchmarks/bench.py                       # масштаб 1k, сравнение с базой
+#   python benchmarks/bench.py --scale 100k 1m       # несколько масштабов
+#   python benchmarks/bench.py --cases cohort_tables --scale 10m
+#   python benchmarks/bench.py --save                # записать текущие результаты как базу
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from cases import CASES
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+SCALES = {
+    "1k": 10**3,
+    "10k": 10**4,
+    "100k": 10**5,
+    "1m": 10**6,
+    "10m": 10**7,
+    "100m": 10**8,
+}
+
+
+def measure(case, rows, repeats):
+    args = case.setup(rows)
+
+    wall, cpu = [], []
+    for _ in range(repeats):
+        gc.collect()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        case.run(*args)
+        wall.append(time.perf_counter() - start_wall)
+        cpu.append(time.process_time() - start_cpu)
+
+    # Память меряется отдельным прогоном: tracemalloc заметно замедляет Python-код
+    gc.collect()
+    tracemalloc.start()
+    case.run(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"rows": rows, "wall_s": min(wall), "cpu_s": min(cpu), "peak_mb": peak / 2**20}
+
+
+def load_baseline(scale):
+    path = os.path.join(BASELINE_DIR, f"{scale}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(scale, results):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f"{scale}.json")
+    previous = load_baseline(scale)
+    previous.update(results)
+    payload = {
+        "scale": scale,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": dict(sorted(previous.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+    return path
+
+
+def compare(result, baseline, time_tolerance, memory_tolerance, min_delta_s=0.005):
+    # Для быстрых случаев относительный допуск слишком шумный, поэтому есть абсолютный порог
+    problems = []
+    if baseline is None:
+        return problems
+    if result["wall_s"] - baseline["wall_s"] > max(baseline["wall_s"] * time_tolerance, min_delta_s):
+        problems.append(f"time {result['wall_s'] / baseline['wall_s']:.2f}x")
+    if result["peak_mb"] > baseline["peak_mb"] * (1 + memory_tolerance) + 1:
+        problems.append(f"memory {result['peak_mb'] / max(baseline['peak_mb'], 1e-9):.2f}x")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the calculator hot paths")
+    parser.add_argument("--scale", nargs="+", default=["1k"], choices=list(SCALES))
+    parser.add_argument("--cases", nargs="+", default=None, help="run only these cases")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = +25%%")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if args.cases is None or case.name in args.cases]
+    regressions = 0
+
+    for scale in args.scale:
+        rows = SCALES[scale]
+        baseline = load_baseline(scale)
+        results = {}
+        print(f"== scale {scale} ({rows:,} rows)")
+        print(f"{'case':<24}{'wall, s':>10}{'cpu, s':>10}{'peak, MB':>11}{'base, s':>10}  status")
+        for case in cases:
+            if rows > case.max_rows:
+                print(f"{case.name:<24}{'skipped: above max_rows':>41}")
+                continue
+            result = measure(case, rows, args.repeats)
+            results[case.name] = result
+            base = baseline.get(case.name)
+            problems = compare(result, base, args.time_tolerance, args.memory_tolerance)
+            regressions += bool(problems)
+            status = "REGRESSION " + ", ".join(problems) if problems else ("ok" if base else "new")
+            base_wall = f"{base['wall_s']:.4f}" if base else "-"
+            print(f"{case.name:<24}{result['wall_s']:>10.4f}{result['cpu_s']:>10.4f}"
+                  f"{result['peak_mb']:>11.1f}{base_wall:>10}  {status}")
+        if args.save and results:
+            print(f"baseline saved: {save_baseline(scale, results)}")
+
+    return 1 if regressions and not args.save else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
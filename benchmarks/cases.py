@@ -0,0 +1,125 @@
+# benchmarks/cases.py
+# Реестр горячих путей калькуляторов. Каждый случай: setup(rows) готовит аргументы (не замеряется),
+# run(*args) — замеряемый вызов, max_rows — предел масштаба, выше которого случай пропускается.
+import os
+import sys
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+import datagen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for app_dir in ("ab_test_calc", "product_calc", "forecast_calculator_for_retail"):
+    path = os.path.join(ROOT, app_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from ab_test_calculator import ABTestCalculator  # noqa: E402
+from forecast_hierarchy import LEVELS, hierarchy_forecast  # noqa: E402
+from forecast_model import forecast_regions  # noqa: E402
+from utils.calc_helpers import cohort_tables, eb_shrinkage, pairwise_z_test, unit_economics_table  # noqa: E402
+from utils.attribution import PathStats  # noqa: E402
+from utils.funnel_engine import ordered_funnel, ordered_funnel_csv  # noqa: E402
+from utils.retention_index import ActivityIndex  # noqa: E402
+
+Case = namedtuple("Case", ["name", "setup", "run", "max_rows"])
+
+FORECAST_PARAMS = dict(
+    price=2000.0, cost=1200.0, plan_sales=1000, marketing_budget=50000.0, marketing_impact=70000.0,
+    fixed_costs=100000.0, variable_costs=400000.0, tax_rate=20.0, n_outlets=5, n_months=6,
+    sales_growth=5, price_growth=0, cost_growth=2, marketing_growth=5,
+    price_elasticity=-1.5, ad_elasticity=0.5, competitor_influence=1.0,
+)
+
+
+def _setup_ab_analyze(rows):
+    # rows — пользователей в каждой группе
+    np.random.seed(0)
+    return (rows, int(rows * 0.10), rows, int(rows * 0.12))
+
+
+def _run_ab_analyze(n_A, conv_A, n_B, conv_B):
+    return ABTestCalculator(bootstrap_iter=200).analyze(n_A, conv_A, n_B, conv_B)
+
+
+def _setup_pairwise(rows):
+    # rows — суммарный размер сетки сравнений, групп ~ sqrt(rows)
+    return (datagen.experiment_table(max(int(np.sqrt(rows)), 2)),)
+
+
+def _setup_forecast(rows):
+    # rows / 100 строк регион×категория: каждая строка даёт 3 сценария × 6 месяцев
+    return (datagen.region_grid(max(rows // 100, 1)),)
+
+
+def _run_forecast(df_input):
+    return forecast_regions(df_input, **FORECAST_PARAMS)
+
+
+def _run_retention_queries(index):
+    # Классический, rolling и bracket retention по готовому индексу — то, что страница пересчитывает на rerun
+    index.classic(7, 12, "W")
+    index.rolling(7, 12, "W")
+    index.bracket([(0, 1), (1, 7), (7, 30), (30, None)], "W")
+
+
+FUNNEL_STEPS = ["view", "click", "lead", "purchase"]
+FUNNEL_WINDOWS = [None, 86400, 7 * 86400, 30 * 86400]
+
+
+def _run_funnel(events):
+    return ordered_funnel(events, FUNNEL_STEPS, FUNNEL_WINDOWS)
+
+
+def _setup_funnel_csv(rows):
+    # Лог пишется на диск один раз на масштаб; замеряется потоковое чтение чанками с партициями по пользователю
+    path = os.path.join(tempfile.gettempdir(), f"bench_funnel_{rows}.csv")
+    if not os.path.exists(path):
+        datagen.funnel_events(rows).to_csv(path, index=False)
+    return (path,)
+
+
+def _run_funnel_csv(path):
+    return ordered_funnel_csv(path, FUNNEL_STEPS, FUNNEL_WINDOWS, chunksize=1_000_000)
+
+
+def _run_attribution(paths):
+    # Сборка матрицы переходов по чанкам + Markov removal effects и Shapley
+    stats = PathStats()
+    for start in range(0, len(paths), 1_000_000):
+        stats.add(paths.iloc[start:start + 1_000_000])
+    return stats.table()
+
+
+def _setup_hierarchy(rows):
+    # rows — нижних рядов регион × категория; прогнозы верхних узлов — зашумлённые суммы снизу
+    forecast = datagen.bottom_forecast(rows)
+    rng = np.random.default_rng(1)
+    sums = hierarchy_forecast(forecast, 6)
+    sums = sums[sums["Уровень"] != LEVELS[3]].reset_index(drop=True)
+    node_forecast = sums.assign(**{m: sums[m] * rng.uniform(0.9, 1.1, len(sums)) for m in ("Выручка", "Чистая прибыль")})
+    return forecast, node_forecast
+
+
+def _run_hierarchy(forecast, node_forecast):
+    hierarchy_forecast(forecast, 6)
+    return hierarchy_forecast(forecast, 6, node_forecast=node_forecast, method="wls_struct")
+
+
+CASES = [
+    Case("ab_analyze", _setup_ab_analyze, _run_ab_analyze, 10**6),
+    Case("pairwise_z_test", _setup_pairwise, pairwise_z_test, 10**5),
+    Case("cohort_tables", lambda rows: (datagen.event_log(rows),), cohort_tables, 10**8),
+    Case("retention_index_build", lambda rows: (datagen.event_log(rows),), ActivityIndex.from_events, 10**8),
+    Case("retention_index_query", lambda rows: (ActivityIndex.from_events(datagen.event_log(rows)),),
+         _run_retention_queries, 10**8),
+    Case("forecast_regions", _setup_forecast, _run_forecast, 10**6),
+    Case("forecast_hierarchy", _setup_hierarchy, _run_hierarchy, 10**6),
+    Case("eb_shrinkage", lambda rows: (datagen.segment_cells(rows),), eb_shrinkage, 10**7),
+    Case("ordered_funnel", lambda rows: (datagen.funnel_events(rows),), _run_funnel, 10**8),
+    Case("ordered_funnel_csv", _setup_funnel_csv, _run_funnel_csv, 10**7),
+    Case("attribution", lambda rows: (datagen.touch_paths(rows),), _run_attribution, 10**8),
+    Case("unit_economics_table", lambda rows: (datagen.segments_table(rows),), unit_economics_table, 10**8),
+]
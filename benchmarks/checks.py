@@ -0,0 +1,175 @@
+# benchmarks/checks.py
+# Регрессионные проверки корректности горячих путей (маленькие входы с заранее известным ответом)
+# и совпадения кода модулей, скопированных в несколько приложений.
+# Скрипт завершается с кодом 1, если хотя бы одна проверка не прошла.
+#
+#   python benchmarks/checks.py
+#   python benchmarks/checks.py --only funnel
+import argparse
+import ast
+import os
+import string
+import sys
+import traceback
+
+import numpy as np
+import pandas as pd
+
+import cases  # пути приложений в sys.path, корень репозитория
+import datagen
+from forecast_hierarchy import ADDITIVE_METRICS, LEVELS, RECONCILE_METHODS, bottom_series, hierarchy_forecast, \
+    node_inputs, summing_matrix
+from forecast_model import complete_rows, forecast_regions
+from utils.funnel_engine import ordered_funnel
+
+
+def check_funnel_later_step_event():
+    # Клики через 1 с и через 5 ч, лид через 5.5 ч при окне лида 1 ч: путь продолжает второй клик, а не первый
+    t0 = pd.Timestamp("2024-01-01")
+    events = pd.DataFrame({
+        "user_id": [1, 1, 1, 1],
+        "event": ["view", "click", "click", "lead"],
+        "timestamp": [t0, t0 + pd.Timedelta("1s"), t0 + pd.Timedelta("5h"), t0 + pd.Timedelta("5.5h")],
+        "channel": "ads",
+    })
+    table = ordered_funnel(events, ["view", "click", "lead"], [None, None, 3600])
+    assert table.loc["ads"].tolist() == [1, 1, 1], table
+
+
+def check_funnel_strict_order():
+    # Шаги с одинаковым временем не считаются пройденными по порядку
+    t0 = pd.Timestamp("2024-01-01")
+    events = pd.DataFrame({"user_id": [1, 1], "event": ["view", "click"], "timestamp": [t0, t0], "channel": "ads"})
+    table = ordered_funnel(events, ["view", "click"])
+    assert table.loc["ads"].tolist() == [1, 0], table
+
+
+def check_hierarchy_coherent_base():
+    # Прогнозы узлов, уже равные суммам снизу, согласование не меняет: все уровни совпадают с bottom-up
+    forecast = datagen.bottom_forecast(50)
+    bottom_up = hierarchy_forecast(forecast, 6)
+    node_forecast = bottom_up[bottom_up["Уровень"] != LEVELS[3]]
+    for method in RECONCILE_METHODS:
+        reconciled = hierarchy_forecast(forecast, 6, node_forecast=node_forecast, method=method)
+        for metric in ADDITIVE_METRICS:
+            assert np.allclose(reconciled[metric], bottom_up[metric], rtol=1e-6), (method, metric)
+
+
+# Данные и параметры формы калькулятора прогнозов по умолчанию
+DEFAULT_INPUT = pd.DataFrame({
+    "Регион": ["Город_1", "Город_2", "Город_3"],
+    "Категория": ["Товар_группа_1", "Товар_группа_2", "Товар_группа_3"],
+    "Коэф. спроса": [1.0, 0.8, 0.9],
+    "Локальная наценка (%)": [10, 5, 7],
+    "Издержки (%)": [5, 3, 4],
+})
+DEFAULT_ARGS = (2000.0, 1200.0, 1000, 50000.0, 70000.0, 100000.0, 400000.0, 20.0, 5, 6, 5, 0, 2, 5, -1.5, 0.5, 1.0)
+
+
+def _default_forecasts(df_input):
+    forecast = forecast_regions(df_input, *DEFAULT_ARGS, scale_effect=True)
+    S, nodes = summing_matrix(bottom_series(forecast))
+    node_forecast = forecast_regions(node_inputs(df_input, S, nodes), *DEFAULT_ARGS, scale_effect=True)
+    return forecast, node_forecast
+
+
+def check_hierarchy_default_profit():
+    # Данные формы по умолчанию: прямые прогнозы агрегатов почти согласованы по выручке,
+    # поэтому согласованная прибыль итого остаётся рядом с суммой снизу (издержки строк не удваиваются)
+    forecast, node_forecast = _default_forecasts(DEFAULT_INPUT)
+    bottom_up = hierarchy_forecast(forecast, 6)
+    total = (bottom_up["Уровень"] == LEVELS[0]).to_numpy()
+    for method in RECONCILE_METHODS:
+        reconciled = hierarchy_forecast(forecast, 6, node_forecast=node_forecast, method=method)
+        for metric in ADDITIVE_METRICS:
+            assert np.allclose(reconciled[metric][total], bottom_up[metric][total], rtol=0.01), (method, metric)
+
+
+def check_hierarchy_blank_editor_row():
+    # Пустая строка редактора («+») отбрасывается до прогноза: агрегаты те же, что без неё, и без NaN
+    blank = pd.DataFrame([{"Регион": None, "Категория": None, "Коэф. спроса": np.nan,
+                           "Локальная наценка (%)": np.nan, "Издержки (%)": np.nan}])
+    df_input = complete_rows(pd.concat([DEFAULT_INPUT, blank], ignore_index=True))
+    assert len(df_input) == len(DEFAULT_INPUT), df_input
+    expected = hierarchy_forecast(forecast_regions(DEFAULT_INPUT, *DEFAULT_ARGS), 6)
+    forecast, node_forecast = _default_forecasts(df_input)
+    for method in (None, *RECONCILE_METHODS):
+        table = hierarchy_forecast(forecast, 6, node_forecast=node_forecast, method=method)
+        for metric in ADDITIVE_METRICS:
+            assert table[metric].notna().all(), (method, metric)
+            if method is None:
+                assert np.allclose(table[metric], expected[metric]), metric
+
+
+def check_node_inputs_missing_series():
+    # Ряд иерархии без строки параметров — ошибка, а не чужие параметры из последней строки
+    forecast = forecast_regions(DEFAULT_INPUT, *DEFAULT_ARGS)
+    S, nodes = summing_matrix(bottom_series(forecast))
+    try:
+        node_inputs(DEFAULT_INPUT.iloc[:2], S, nodes)
+    except ValueError as e:
+        assert "Город_3" in str(e), e
+    else:
+        raise AssertionError("node_inputs accepted a series without parameters")
+
+
+def _split_texts(path):
+    # AST без комментариев и без присваивания TEXTS: переводы интерфейса в копиях могут различаться, код — нет.
+    # У переводов сверяются ключи и подстановки {…}
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    texts = {}
+    body = []
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and [getattr(t, "id", None) for t in node.targets] == ["TEXTS"]:
+            texts = ast.literal_eval(node.value)
+        else:
+            body.append(node)
+    tree.body = body
+    fields = {key: sorted(name for _, name, _, _ in string.Formatter().parse(text) if name)
+              for key, text in texts.items()}
+    return ast.dump(tree), fields
+
+
+def check_job_helpers_copies():
+    # Приложения разворачиваются отдельно, поэтому у каждого своя копия job_helpers; код копий не должен расходиться
+    canonical = os.path.join(cases.ROOT, "product_calc", "utils", "job_helpers.py")
+    code, fields = _split_texts(canonical)
+    for copy in ("ab_test_calc/job_helpers.py", "forecast_calculator_for_retail/job_helpers.py"):
+        copy_code, copy_fields = _split_texts(os.path.join(cases.ROOT, copy))
+        assert copy_code == code, f"{copy}: code differs from {canonical}"
+        assert copy_fields == fields, f"{copy}: TEXTS keys or placeholders differ from {canonical}"
+
+
+CHECKS = {
+    "funnel_later_step_event": check_funnel_later_step_event,
+    "funnel_strict_order": check_funnel_strict_order,
+    "hierarchy_coherent_base": check_hierarchy_coherent_base,
+    "hierarchy_default_profit": check_hierarchy_default_profit,
+    "hierarchy_blank_editor_row": check_hierarchy_blank_editor_row,
+    "node_inputs_missing_series": check_node_inputs_missing_series,
+    "job_helpers_copies": check_job_helpers_copies,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Correctness checks for hot paths and copied modules")
+    parser.add_argument("--only", default="", help="run only checks whose name contains this substring")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name, check in CHECKS.items():
+        if args.only not in name:
+            continue
+        try:
+            check()
+            print(f"[ok]   {name}")
+        except Exception:
+            failed += 1
+            print(f"[FAIL] {name}")
+            print("       " + traceback.format_exc().strip().replace("\n", "\n       "))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
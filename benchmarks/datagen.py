@@ -0,0 +1,137 @@
+# benchmarks/datagen.py
+# Синтетические данные для бенчмарков: журнал событий, таблица эксперимента, сетка регион×категория.
+# Все генераторы векторные и детерминированные по seed, так что размеры до 100M строк упираются только в память.
+import numpy as np
+import pandas as pd
+
+
+def event_log(n_rows, n_users=None, days=365, start="2024-01-01", seed=0):
+    # user_id, install_date, event_date, revenue — формат страниц Retention и Cohort Analysis
+    rng = np.random.default_rng(seed)
+    n_users = n_users or max(n_rows // 10, 1)
+
+    install_offset = rng.integers(0, days, n_users)
+    user_id = rng.integers(0, n_users, n_rows)
+    # Активность затухает со временем после установки
+    lag = rng.geometric(0.03, n_rows) - 1
+    start = np.datetime64(start, "D")
+    install_date = start + install_offset[user_id]
+    event_date = install_date + lag
+    revenue = np.round(rng.exponential(5.0, n_rows) * (rng.random(n_rows) < 0.1), 2)
+
+    return pd.DataFrame({
+        "user_id": user_id,
+        "install_date": install_date.astype("datetime64[ns]"),
+        "event_date": event_date.astype("datetime64[ns]"),
+        "revenue": revenue,
+    })
+
+
+def experiment_table(n_groups, users_per_group=10_000, base_rate=0.1, seed=0):
+    # Формат таблицы групп на странице A/B/n теста
+    rng = np.random.default_rng(seed)
+    users = rng.integers(users_per_group // 2, users_per_group * 2, n_groups)
+    rates = np.clip(base_rate * (1 + rng.normal(0, 0.1, n_groups)), 0.001, 0.999)
+    return pd.DataFrame({
+        "Группа": [f"G{i}" for i in range(n_groups)],
+        "Пользователи": users,
+        "Конверсии": rng.binomial(users, rates),
+    })
+
+
+def region_grid(n_rows, n_regions=None, seed=0):
+    # Формат таблицы параметров калькулятора прогнозов: регион × категория
+    rng = np.random.default_rng(seed)
+    n_regions = n_regions or max(int(np.sqrt(n_rows)), 1)
+    n_categories = max(int(np.ceil(n_rows / n_regions)), 1)
+    idx = np.arange(n_rows)
+    return pd.DataFrame({
+        "Регион": pd.Categorical.from_codes(idx % n_regions, [f"Город_{i + 1}" for i in range(n_regions)]),
+        "Категория": pd.Categorical.from_codes(
+            idx // n_regions % n_categories, [f"Товар_группа_{i + 1}" for i in range(n_categories)]
+        ),
+        "Коэф. спроса": np.round(rng.uniform(0.5, 1.5, n_rows), 2),
+        "Локальная наценка (%)": rng.integers(0, 20, n_rows),
+        "Издержки (%)": rng.integers(0, 10, n_rows),
+    })
+
+
+def segments_table(n_rows, seed=0):
+    # Входные данные юнит-экономики: строка на сегмент
+    rng = np.random.default_rng(seed)
+    users = rng.integers(1_000, 100_000, n_rows)
+    return pd.DataFrame({
+        "name": np.arange(1, n_rows + 1),
+        "users": users,
+        "paying": np.maximum((users * rng.uniform(0.05, 0.3, n_rows)).astype(int), 1),
+        "revenue": users * rng.uniform(1, 10, n_rows),
+        "marketing": users * rng.uniform(0.5, 3, n_rows),
+        "var_cost": rng.uniform(0, 2, n_rows),
+        "retention": rng.integers(1, 37, n_rows),
+        "gpm": rng.integers(0, 101, n_rows),
+    })
+
+
+def segment_cells(n_cells, n_groups=2, base_rate=0.05, seed=0):
+    # Ячейки сегмент × группа для A/B анализа по срезам: много маленьких ячеек с разной истинной конверсией
+    rng = np.random.default_rng(seed)
+    n_segments = max(n_cells // n_groups, 1)
+    true_rates = rng.beta(base_rate * 200, (1 - base_rate) * 200, n_segments * n_groups)
+    users = rng.integers(20, 5_000, n_segments * n_groups)
+    return pd.DataFrame({
+        "Сегмент": np.repeat(np.arange(n_segments), n_groups),
+        "Группа": np.tile(np.array(["A", "B", "C", "D"][:n_groups]), n_segments),
+        "Пользователи": users,
+        "Конверсии": rng.binomial(users, true_rates),
+    })
+
+
+def funnel_events(n_rows, n_users=None, channels=("Facebook", "Google", "Email", "SEO"), seed=0,
+                  start="2024-01-01", days=90):
+    # user_id, event, timestamp, channel — лог для воронки view → click → lead → purchase на странице маркетинга
+    rng = np.random.default_rng(seed)
+    n_users = n_users or max(n_rows // 5, 1)
+    user_id = rng.integers(0, n_users, n_rows)
+    # Чем дальше шаг, тем реже событие; время — случайное в пределах периода
+    event = rng.choice(np.array(["view", "click", "lead", "purchase"]), n_rows, p=[0.6, 0.25, 0.1, 0.05])
+    seconds = rng.integers(0, days * 86400, n_rows)
+    user_channel = rng.integers(0, len(channels), n_users)
+    return pd.DataFrame({
+        "user_id": user_id,
+        "event": event,
+        "timestamp": np.datetime64(start, "s") + seconds,
+        "channel": pd.Categorical.from_codes(user_channel[user_id], list(channels)),
+    })
+
+
+def touch_paths(n_rows, n_unique=5_000, channels=("Facebook", "Google", "Email", "SEO", "Direct", "Referral"),
+                max_len=8, seed=0):
+    # path, conversions, nulls — строка на пользователя; пути берутся из пула уникальных, как в реальных логах
+    rng = np.random.default_rng(seed)
+    lengths = np.minimum(rng.geometric(0.4, n_unique), max_len)
+    names = np.array(channels)
+    pool = np.array([" > ".join(names[rng.integers(0, len(channels), n)]) for n in lengths])
+    # Длинные пути конвертируются чаще
+    rates = np.clip(0.02 * lengths, 0, 0.5)
+    pick = rng.integers(0, n_unique, n_rows)
+    conversions = (rng.random(n_rows) < rates[pick]).astype(np.int64)
+    return pd.DataFrame({"path": pool[pick], "conversions": conversions, "nulls": 1 - conversions})
+
+
+def bottom_forecast(n_series, n_months=6, seed=0):
+    # Длинная таблица прогноза нижнего уровня (регион × категория × сценарий × месяц) в формате forecast_regions —
+    # без самой модели, чтобы иерархию можно было мерить на 100k+ рядов
+    rng = np.random.default_rng(seed)
+    keys = region_grid(n_series, seed=seed)[["Регион", "Категория"]]
+    scenarios = ["Базовый", "Оптимистичный", "Пессимистичный"]
+    n_cols = len(scenarios) * n_months
+    idx = np.repeat(np.arange(n_series), n_cols)
+    revenue = rng.lognormal(13, 0.5, n_series * n_cols)
+    return pd.DataFrame({
+        "Месяц": np.tile(np.arange(1, n_months + 1), n_series * len(scenarios)),
+        "Сценарий": np.tile(np.repeat(scenarios, n_months), n_series),
+        "Выручка": revenue,
+        "Чистая прибыль": revenue * rng.uniform(-0.05, 0.2, len(revenue)),
+        "Регион": keys["Регион"].to_numpy()[idx],
+        "Категория": keys["Категория"].to_numpy()[idx],
+    })
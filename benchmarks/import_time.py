@@ -0,0 +1,88 @@
+# benchmarks/import_time.py
+# Замер времени импорта калькуляторов через `python -X importtime`.
+# Каждый модуль импортируется в чистом подпроцессе несколько раз, берётся минимум.
+# Скрипт завершается с кодом 1, если модуль превысил бюджет или потянул запрещённую зависимость.
+#
+#   python benchmarks/import_time.py
+#   python benchmarks/import_time.py --config benchmarks/import_budget.json --top 10
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG = os.path.join(ROOT, "benchmarks", "import_budget.json")
+
+
+def parse_importtime(stderr):
+    # Строки вида: "import time:   self [us] | cumulative | imported package"
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module, path):
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, path))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.join(ROOT, path),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def check_module(spec, repeats, top):
+    module = spec["module"]
+    runs = [measure_import(module, spec["path"]) for _ in range(repeats)]
+    best = min(runs, key=lambda t: t[module][1])
+    total_ms = best[module][1] / 1000
+    budget_ms = spec["budget_ms"]
+
+    failures = []
+    if total_ms > budget_ms:
+        failures.append(f"{total_ms:.0f} ms > budget {budget_ms} ms")
+    loaded = [name for name in spec.get("forbidden", []) if name in best]
+    if loaded:
+        failures.append("eagerly imports " + ", ".join(loaded))
+
+    status = "FAIL" if failures else "ok"
+    print(f"[{status}] {module}: {total_ms:.0f} ms (budget {budget_ms} ms)")
+    for failure in failures:
+        print(f"       {failure}")
+    if top:
+        heaviest = sorted(
+            ((name, t[1]) for name, t in best.items() if name != module),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:top]
+        for name, cumulative_us in heaviest:
+            print(f"       {cumulative_us / 1000:8.1f} ms  {name}")
+    return not failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time budget check for the calculators")
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--repeats", type=int, default=None)
+    parser.add_argument("--top", type=int, default=5, help="show the N heaviest dependencies")
+    args = parser.parse_args(argv)
+
+    with open(args.config, encoding="utf-8") as f:
+        config = json.load(f)
+    repeats = args.repeats or config.get("repeats", 3)
+
+    results = [check_module(spec, repeats, args.top) for spec in config["modules"]]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# calc_service/loadgen.py
+# Нагрузочный генератор для локального сервиса: N соединений с keep-alive шлют запросы без пауз.
+#   python calc_service/loadgen.py --endpoint z_test --concurrency 64 --requests 20000
+#   python calc_service/loadgen.py --endpoint ab/analyze --concurrency 8 --requests 200
+# В конце печатает пропускную способность, перцентили задержки на стороне клиента и /metrics сервера.
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+def _z_test(rng):
+    n1, n2 = rng.randint(1_000, 50_000), rng.randint(1_000, 50_000)
+    return {"n1": n1, "c1": int(n1 * rng.uniform(0.05, 0.15)), "n2": n2, "c2": int(n2 * rng.uniform(0.05, 0.15))}
+
+
+def _pairwise(rng):
+    groups = []
+    for i in range(rng.randint(2, 6)):
+        users = rng.randint(1_000, 20_000)
+        groups.append({"Группа": f"G{i}", "Пользователи": users, "Конверсии": int(users * rng.uniform(0.05, 0.15))})
+    return {"groups": groups}
+
+
+def _unit_economics(rng):
+    segments = []
+    for i in range(rng.randint(1, 10)):
+        users = rng.randint(1_000, 100_000)
+        segments.append({"name": f"S{i}", "users": users, "paying": int(users * rng.uniform(0.05, 0.3)),
+                         "revenue": users * rng.uniform(1, 10), "marketing": users * rng.uniform(0.5, 3),
+                         "var_cost": rng.uniform(0, 2), "retention": rng.randint(1, 36), "gpm": rng.randint(20, 90)})
+    return {"segments": segments}
+
+
+def _ab_analyze(rng):
+    n_A, n_B = rng.randint(1_000, 10_000), rng.randint(1_000, 10_000)
+    return {"n_A": n_A, "conv_A": int(n_A * 0.10), "n_B": n_B, "conv_B": int(n_B * 0.11),
+            "bootstrap_iter": 500, "bayes_iter": 10_000}
+
+
+def _forecast(rng):
+    regions = [{"Регион": f"Город_{i}", "Категория": "Товар_группа_1", "Коэф. спроса": rng.uniform(0.5, 1.5),
+                "Локальная наценка (%)": rng.randint(0, 20), "Издержки (%)": rng.randint(0, 10)} for i in range(3)]
+    return {"regions": regions, "price": 2000, "cost": 1200, "plan_sales": 1000, "marketing_budget": 50000,
+            "marketing_impact": 70000, "fixed_costs": 100000, "variable_costs": 400000, "tax_rate": 20,
+            "n_outlets": 5, "n_months": 6, "sales_growth": 5, "price_growth": 0, "cost_growth": 2,
+            "marketing_growth": 5, "price_elasticity": -1.5, "ad_elasticity": 0.5, "competitor_influence": 1.0}
+
+
+PAYLOADS = {
+    "z_test": _z_test,
+    "pairwise_z_test": _pairwise,
+    "unit_economics": _unit_economics,
+    "ab/analyze": _ab_analyze,
+    "forecast": _forecast,
+}
+
+
+async def _request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+
+async def _worker(host, port, path, make_payload, counter, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, "POST", path, make_payload(rng))
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(url, endpoint, concurrency, requests):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    counter, latencies, errors = [requests], [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(host, port, f"/{endpoint}", PAYLOADS[endpoint], counter, latencies, errors, seed)
+        for seed in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    print(f"{endpoint}: {len(latencies)} requests, {concurrency} connections, {elapsed:.2f} s")
+    print(f"  throughput  {len(latencies) / elapsed:,.0f} req/s")
+    print(f"  latency ms  p50 {np.percentile(ms, 50):.2f}  p95 {np.percentile(ms, 95):.2f}  "
+          f"p99 {np.percentile(ms, 99):.2f}  max {ms.max():.2f}")
+    print(f"  errors      {len(errors)}")
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await _request(reader, writer, host, "GET", "/metrics")
+    writer.close()
+    print(json.dumps(metrics, indent=2, ensure_ascii=False))
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the local calc service")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--endpoint", choices=sorted(PAYLOADS), default="z_test")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=10_000)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args.url, args.endpoint, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,459 @@
+# calc_service/server.py
+# Локальный HTTP-сервис с теми же расчётами, что и Streamlit-приложения.
+#   python calc_service/server.py --port 8765 --workers 4
+# Дешёвые векторные расчёты (z-тест, попарные z-тесты, юнит-экономика) копятся микро-батчами и считаются одним
+# вызовом; тяжёлые (bootstrap/Bayes в ABTestCalculator, прогноз по регионам) уходят в общий пул процессов.
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import signal
+import sys
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for app_dir in ("ab_test_calc", "product_calc", "forecast_calculator_for_retail"):
+    path = os.path.join(ROOT, app_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from ab_test_calculator import ABTestCalculator  # noqa: E402
+from forecast_model import forecast_regions  # noqa: E402
+from utils.calc_helpers import pairwise_z_test_batch, unit_economics_table, z_test_conversion  # noqa: E402
+
+logger = logging.getLogger("calc.service")
+
+MAX_BODY = 16 * 2**20
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+FORECAST_PARAMS = [
+    "price", "cost", "plan_sales", "marketing_budget", "marketing_impact", "fixed_costs", "variable_costs",
+    "tax_rate", "n_outlets", "n_months", "sales_growth", "price_growth", "cost_growth", "marketing_growth",
+    "price_elasticity", "ad_elasticity", "competitor_influence",
+]
+SEGMENT_COLUMNS = ["name", "users", "paying", "revenue", "marketing", "var_cost", "retention", "gpm"]
+GROUP_COLUMNS = ["Группа", "Пользователи", "Конверсии"]
+REGION_COLUMNS = ["Регион", "Категория", "Коэф. спроса", "Локальная наценка (%)", "Издержки (%)"]
+MAX_RECORDS = 10_000  # строк в одном запросе
+MAX_GROUPS = 100  # групп в попарном сравнении: пар растёт как квадрат
+# Пределы тяжёлых расчётов: bootstrap держит массив на каждого пользователя и делает bootstrap_iter × (n_A + n_B)
+# выборок, поэтому без них один запрос занимает воркер пула на минуты или выедает его память
+ALTERNATIVES = ("two-sided", "greater", "less")
+AB_MAX_USERS = 1_000_000
+AB_MAX_BOOTSTRAP_ITER = 20_000
+AB_MAX_BAYES_ITER = 1_000_000
+AB_MAX_BOOTSTRAP_DRAWS = 2 * 10**8
+FORECAST_MAX_MONTHS = 120
+# forecast_regions считает строки × месяцы × 3 сценария циклом pandas, ~1.5 мс на строку-месяц:
+# бюджет держит один запрос в пределах нескольких секунд (например, 200 строк × 12 мес или 20 × 120)
+FORECAST_MAX_ROW_MONTHS = 2_400
+# Пределы параметров модели: на competitor_influence делится спрос, темпы роста возводятся в степень месяца
+FORECAST_RANGES = {
+    "price": (0, math.inf), "cost": (0, math.inf), "plan_sales": (0, math.inf), "marketing_budget": (0, math.inf),
+    "marketing_impact": (0, math.inf), "fixed_costs": (0, math.inf), "variable_costs": (0, math.inf),
+    "tax_rate": (0, 100), "sales_growth": (-100, 100), "price_growth": (-100, 100), "cost_growth": (-100, 100),
+    "marketing_growth": (-100, 100), "competitor_influence": (0.01, 100),
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def to_json(value):
+    # numpy-скаляры, массивы и DataFrame -> JSON; NaN/inf -> null, чтобы ответ был валидным JSON
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, pd.DataFrame):
+        return to_json(value.to_dict(orient="records"))
+    if isinstance(value, np.ndarray):
+        return to_json(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _is_number(value):
+    # Только JSON-числа: строки вроде "lots" и true/false не приводятся молча, NaN/inf не принимаются
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _number(payload, key, cast=float, low=-math.inf, high=math.inf, default=None):
+    if key not in payload:
+        if default is not None:
+            return default
+        raise BadRequest(f"missing field '{key}'")
+    value = payload[key]
+    if not _is_number(value):
+        raise BadRequest(f"field '{key}' must be a finite number")
+    if cast is int and value != int(value):
+        raise BadRequest(f"field '{key}' must be an integer")
+    if not low <= value <= high:
+        raise BadRequest(f"field '{key}' must be between {low} and {high}")
+    return cast(value)
+
+
+def _records(payload, key, columns, numeric, max_rows=MAX_RECORDS):
+    # Строки остаются списком dict: DataFrame строится один раз на весь батч, а не на каждый запрос.
+    # Типы проверяются здесь: ошибка в одном запросе не должна доходить до общего векторного вызова
+    rows = payload.get(key)
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        raise BadRequest(f"'{key}' must be a non-empty list of objects")
+    if len(rows) > max_rows:
+        raise BadRequest(f"'{key}' has {len(rows)} rows, at most {max_rows} are allowed")
+    missing = sorted({col for row in rows for col in columns if col not in row})
+    if missing:
+        raise BadRequest(f"'{key}' is missing columns: {', '.join(missing)}")
+    for col in columns:
+        check = _is_number if col in numeric else (lambda value: isinstance(value, (str, int, float)))
+        bad = next((i for i, row in enumerate(rows) if not check(row[col])), None)
+        if bad is not None:
+            kind = "a finite number" if col in numeric else "a string or a number"
+            raise BadRequest(f"'{key}[{bad}].{col}' must be {kind}")
+    return rows
+
+
+def _split_records(table, sizes):
+    # Результат батча -> по списку записей на запрос; to_dict один раз на весь батч
+    records = to_json(table.to_dict(orient="records"))
+    bounds = np.r_[0, np.cumsum(sizes)]
+    return [records[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+# --- Батч-обработчики: список проверенных входов -> список ответов в том же порядке ---
+
+def _parse_z_test(payload):
+    # Те же границы, что у /ab/analyze: n — целое ≥ 1, конверсии — целые от 0 до n
+    n1 = _number(payload, "n1", int, 1)
+    c1 = _number(payload, "c1", int, 0, n1)
+    n2 = _number(payload, "n2", int, 1)
+    c2 = _number(payload, "c2", int, 0, n2)
+    return [n1, c1, n2, c2]
+
+
+def batch_z_test(items):
+    n1, c1, n2, c2 = np.array(items, dtype=float).T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = z_test_conversion(n1, c1, n2, c2)
+    return [{key: values[i] for key, values in result.items()} for i in range(len(items))]
+
+
+def _parse_pairwise(payload):
+    groups = _records(payload, "groups", GROUP_COLUMNS, GROUP_COLUMNS[1:], max_rows=MAX_GROUPS)
+    for i, row in enumerate(groups):
+        try:
+            users = _number(row, "Пользователи", int, 1)
+            _number(row, "Конверсии", int, 0, users)
+        except BadRequest as e:
+            raise BadRequest(f"'groups[{i}]': {e}") from None
+    return groups
+
+
+def batch_pairwise(items):
+    # Каждый запрос — отдельный "эксперимент" для pairwise_z_test_batch; пары идут в порядке запросов
+    groups = pd.DataFrame([row for rows in items for row in rows], columns=GROUP_COLUMNS)
+    groups["_request"] = np.repeat(np.arange(len(items)), [len(rows) for rows in items])
+    pairs = pairwise_z_test_batch(groups, experiment_col="_request")
+    sizes = np.bincount(pairs["_request"].to_numpy(), minlength=len(items))
+    return _split_records(pairs.drop(columns="_request"), sizes)
+
+
+def _parse_unit_economics(payload):
+    return _records(payload, "segments", SEGMENT_COLUMNS, SEGMENT_COLUMNS[1:])
+
+
+def batch_unit_economics(items):
+    segments = pd.DataFrame([row for rows in items for row in rows], columns=SEGMENT_COLUMNS)
+    return _split_records(unit_economics_table(segments), [len(rows) for rows in items])
+
+
+# --- Тяжёлые расчёты в пуле процессов ---
+
+def _init_worker():
+    # После fork у всех процессов одинаковое состояние np.random — пересеиваем, чтобы bootstrap не совпадали
+    np.random.seed()
+
+
+def run_ab_analyze(params, data):
+    calc = ABTestCalculator(**params)
+    return to_json(calc.analyze(*data))
+
+
+def _parse_ab_analyze(payload):
+    n_A, n_B = (_number(payload, key, int, 1, AB_MAX_USERS) for key in ("n_A", "n_B"))
+    conv_A = _number(payload, "conv_A", int, 0, n_A)
+    conv_B = _number(payload, "conv_B", int, 0, n_B)
+    alternative = payload.get("alternative", "two-sided")
+    if alternative not in ALTERNATIVES:
+        raise BadRequest(f"'alternative' must be one of: {', '.join(ALTERNATIVES)}")
+    params = {
+        "alpha": _number(payload, "alpha", float, 1e-6, 0.5, default=0.05),
+        "delta": _number(payload, "delta", float, -1, 1, default=0.0),
+        "bootstrap_iter": _number(payload, "bootstrap_iter", int, 1, AB_MAX_BOOTSTRAP_ITER, default=5000),
+        "bayes_iter": _number(payload, "bayes_iter", int, 1, AB_MAX_BAYES_ITER, default=10_000),
+        "alternative": alternative,
+    }
+    if params["bootstrap_iter"] * (n_A + n_B) > AB_MAX_BOOTSTRAP_DRAWS:
+        raise BadRequest(f"bootstrap_iter × (n_A + n_B) must not exceed {AB_MAX_BOOTSTRAP_DRAWS:,}; "
+                         f"lower bootstrap_iter for samples this large")
+    return params, (n_A, conv_A, n_B, conv_B)
+
+
+def run_forecast(regions, params, scale_effect):
+    return to_json(forecast_regions(pd.DataFrame(regions), scale_effect=scale_effect, **params))
+
+
+def _parse_forecast(payload):
+    regions = _records(payload, "regions", REGION_COLUMNS, REGION_COLUMNS[2:])
+    params = {key: _number(payload, key, float, *FORECAST_RANGES.get(key, (-math.inf, math.inf)))
+              for key in FORECAST_PARAMS}
+    params["n_outlets"] = _number(payload, "n_outlets", int, 1, 10**6)
+    params["n_months"] = _number(payload, "n_months", int, 1, FORECAST_MAX_MONTHS)
+    if len(regions) * params["n_months"] > FORECAST_MAX_ROW_MONTHS:
+        raise BadRequest(f"len(regions) × n_months must not exceed {FORECAST_MAX_ROW_MONTHS:,}; "
+                         f"split the regions across several requests")
+    return regions, params, bool(payload.get("scale_effect", True))
+
+
+class MicroBatcher:
+    # Запросы, пришедшие в пределах max_delay, считаются одним векторным вызовом (не больше max_batch за раз)
+    def __init__(self, name, handler, metrics, max_batch=512, max_delay=0.002):
+        self.name = name
+        self.handler = handler
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            results = [(result, None) for result in self.handler([item for item, _ in batch])]
+        except Exception as e:
+            # Один плохой вход не должен ронять чужие запросы: батч пересчитывается по одному
+            if len(batch) == 1:
+                results = [(None, e)]
+            else:
+                logger.warning("%s: batch of %d failed (%s), retrying items one by one", self.name, len(batch), e)
+                results = [self._run_one(item) for item, _ in batch]
+        finally:
+            self.metrics.record_batch(self.name, len(batch), time.perf_counter() - start)
+        for (_, future), (result, error) in zip(batch, results):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _run_one(self, item):
+        try:
+            return self.handler([item])[0], None
+        except Exception as e:
+            return None, e
+
+
+class Metrics:
+    # Задержки по маршрутам (последние window запросов), счётчики, ошибки, размеры батчей, очередь пула
+    def __init__(self, window=10_000):
+        self.started = time.time()
+        self.latency = defaultdict(lambda: deque(maxlen=window))
+        self.finished = defaultdict(lambda: deque(maxlen=window))
+        self.count = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.batches = defaultdict(lambda: {"batches": 0, "items": 0, "max_size": 0, "compute_s": 0.0})
+        self.pool_in_flight = 0
+
+    def record(self, route, seconds, ok):
+        self.latency[route].append(seconds)
+        self.finished[route].append(time.time())
+        self.count[route] += 1
+        if not ok:
+            self.errors[route] += 1
+
+    def record_batch(self, name, size, seconds):
+        stats = self.batches[name]
+        stats["batches"] += 1
+        stats["items"] += size
+        stats["max_size"] = max(stats["max_size"], size)
+        stats["compute_s"] += seconds
+
+    def snapshot(self):
+        now = time.time()
+        routes = {}
+        for route, values in self.latency.items():
+            ms = np.array(values) * 1000
+            recent = sum(1 for t in self.finished[route] if now - t <= 10)
+            routes[route] = {
+                "requests": self.count[route],
+                "errors": self.errors[route],
+                "rps_10s": recent / 10,
+                "latency_ms": {"mean": ms.mean(), "p50": np.percentile(ms, 50), "p95": np.percentile(ms, 95),
+                               "p99": np.percentile(ms, 99), "max": ms.max()},
+            }
+        batches = {
+            name: {**stats, "mean_size": stats["items"] / stats["batches"] if stats["batches"] else 0}
+            for name, stats in self.batches.items()
+        }
+        return to_json({"uptime_s": now - self.started, "routes": routes, "batches": batches,
+                        "pool_in_flight": self.pool_in_flight})
+
+
+class CalcService:
+    def __init__(self, workers=None, max_batch=512, max_delay=0.002):
+        self.metrics = Metrics()
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self.batchers = {
+            name: MicroBatcher(name, handler, self.metrics, max_batch, max_delay)
+            for name, handler in (("z_test", batch_z_test), ("pairwise_z_test", batch_pairwise),
+                                  ("unit_economics", batch_unit_economics))
+        }
+        self.routes = {
+            ("POST", "/z_test"): lambda p: self.batchers["z_test"].submit(_parse_z_test(p)),
+            ("POST", "/pairwise_z_test"): lambda p: self.batchers["pairwise_z_test"].submit(_parse_pairwise(p)),
+            ("POST", "/unit_economics"): lambda p: self.batchers["unit_economics"].submit(_parse_unit_economics(p)),
+            ("POST", "/ab/analyze"): lambda p: self._in_pool(run_ab_analyze, *_parse_ab_analyze(p)),
+            ("POST", "/forecast"): lambda p: self._in_pool(run_forecast, *_parse_forecast(p)),
+            ("GET", "/metrics"): self._metrics,
+            ("GET", "/health"): self._health,
+        }
+
+    async def _in_pool(self, func, *args):
+        self.metrics.pool_in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+        finally:
+            self.metrics.pool_in_flight -= 1
+
+    async def _metrics(self, payload):
+        return self.metrics.snapshot()
+
+    async def _health(self, payload):
+        return {"status": "ok"}
+
+    async def dispatch(self, method, path, body):
+        route = self.routes.get((method, path))
+        if route is None:
+            allowed = any(p == path for _, p in self.routes)
+            return (405 if allowed else 404), {"error": f"{method} {path} is not supported"}
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise BadRequest("request body must be a JSON object")
+            return 200, to_json(await route(payload))
+        except (BadRequest, json.JSONDecodeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            logger.exception("%s %s failed", method, path)
+            return 500, {"error": str(e)}
+
+    async def handle_connection(self, reader, writer):
+        # Минимальный HTTP/1.1 с keep-alive: строка запроса, заголовки, тело по Content-Length
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                start = time.perf_counter()
+                if length > MAX_BODY:
+                    status, response = 413, {"error": "request body is too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    path = target.split("?", 1)[0]
+                    status, response = await self.dispatch(method, path, body)
+                    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                    if path != "/metrics":
+                        self.metrics.record(f"{method} {path}", time.perf_counter() - start, status == 200)
+
+                data = json.dumps(response, ensure_ascii=False).encode()
+                writer.write(
+                    f"{version} {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        logger.info("calc service on http://%s:%d", host, port)
+        # SIGINT/SIGTERM останавливают сервер штатно, после чего закрывается пул процессов
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass  # Windows: остаётся KeyboardInterrupt
+        async with server:
+            await stop.wait()
+        logger.info("calc service stopped")
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service for the calculators")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--max-batch", type=int, default=512)
+    parser.add_argument("--batch-delay-ms", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    service = CalcService(args.workers, args.max_batch, args.batch_delay_ms / 1000)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# export_helpers.py
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from perf_helpers import record_stage
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "forecast_exports")
+CHUNK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_575  # без строки заголовка
+EXPORT_TTL_S = 3600  # готовые файлы старше часа удаляются при следующем экспорте
+
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/octet-stream",
+    "zip": "application/zip",
+}
+
+# Фоновые потоки и готовые файлы общие для всех сессий процесса
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def frames_hash(sheets, fmt):
+    digest = hashlib.sha1(fmt.encode())
+    for name, df in sheets.items():
+        digest.update(str(name).encode())
+        digest.update(str(list(df.columns)).encode())
+        digest.update(str(list(df.dtypes)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _flatten_index(df):
+    # Именованный индекс (например, когорта в pivot) выгружается как обычная колонка
+    if any(name is not None for name in df.index.names):
+        return df.reset_index()
+    return df
+
+
+def iter_chunks(df, chunk_rows=CHUNK_ROWS):
+    # Индекс и имена колонок приводятся по кускам: копия всей таблицы удвоила бы память процесса
+    for start in range(0, len(df), chunk_rows):
+        chunk = _flatten_index(df.iloc[start:start + chunk_rows])
+        yield chunk.rename(columns=str)
+
+
+def _excel_value(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def write_xlsx(sheets, path):
+    # constant_memory: xlsxwriter сбрасывает каждую строку на диск, строки пишутся строго по порядку
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "nan_inf_to_errors": True, "default_date_format": "yyyy-mm-dd"})
+    try:
+        for name, df in sheets.items():
+            header = [str(col) for col in _flatten_index(df.head(0)).columns]
+            # Лист Excel ограничен ~1M строк, остаток уходит на продолжение листа
+            for part, start in enumerate(range(0, max(len(df), 1), EXCEL_MAX_ROWS)):
+                sheet_name = str(name)[:31] if part == 0 else f"{str(name)[:27]}_{part + 1}"
+                worksheet = workbook.add_worksheet(sheet_name)
+                worksheet.write_row(0, 0, header)
+                row_idx = 1
+                for chunk in iter_chunks(df.iloc[start:start + EXCEL_MAX_ROWS]):
+                    for values in chunk.itertuples(index=False, name=None):
+                        worksheet.write_row(row_idx, 0, [_excel_value(v) for v in values])
+                        row_idx += 1
+    finally:
+        workbook.close()
+
+
+def write_csv(df, stream):
+    if df.empty:
+        _flatten_index(df).to_csv(stream, index=False)
+        return
+    for i, chunk in enumerate(iter_chunks(df)):
+        chunk.to_csv(stream, index=False, header=(i == 0))
+
+
+def write_parquet(df, path, row_group_rows=CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Схема по первой строке: на пустом срезе текстовые колонки получили бы тип null
+    schema = pa.Schema.from_pandas(_flatten_index(df.head(1)).rename(columns=str), preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(df, row_group_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _build_export(sheets, fmt, path):
+    # Время сборки меряется в рабочем потоке: на странице видна только постановка задачи
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    tmp_path = path + ".part"
+    if fmt == "xlsx":
+        write_xlsx(sheets, tmp_path)
+    elif len(sheets) == 1 and fmt == "csv":
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            write_csv(next(iter(sheets.values())), f)
+    elif len(sheets) == 1 and fmt == "parquet":
+        write_parquet(next(iter(sheets.values())), tmp_path)
+    else:
+        # Несколько таблиц в CSV/Parquet упаковываются в zip по файлу на таблицу
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, df in sheets.items():
+                if fmt == "csv":
+                    with zf.open(f"{name}.csv", "w") as raw:
+                        with io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                            write_csv(df, f)
+                else:
+                    part_path = f"{tmp_path}.{name}.parquet"
+                    write_parquet(df, part_path)
+                    zf.write(part_path, f"{name}.parquet")
+                    os.remove(part_path)
+    os.replace(tmp_path, path)
+    return {"path": path, "wall_ms": (time.perf_counter() - start_wall) * 1000,
+            "cpu_ms": (time.thread_time() - start_cpu) * 1000}
+
+
+def export_extension(sheets, fmt):
+    if fmt in ("csv", "parquet") and len(sheets) > 1:
+        return "zip"
+    return fmt
+
+
+def _remove_expired(now=None):
+    # Файлы экспорта старше EXPORT_TTL_S удаляются; задачи на них забываются, чтобы следующий запрос пересобрал файл
+    now = time.time() if now is None else now
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > EXPORT_TTL_S:
+                os.remove(entry.path)
+        except OSError:
+            pass
+    with _jobs_lock:
+        finished = [key for key, job in _jobs.items() if job.done()]
+        for key in finished:
+            job = _jobs[key]
+            if job.exception() is not None or not os.path.exists(job.result()["path"]):
+                del _jobs[key]
+
+
+def submit_export(sheets, fmt, key=None):
+    # Повторный запрос с теми же данными возвращает уже готовый или выполняющийся экспорт
+    _remove_expired()
+    key = key or frames_hash(sheets, fmt)
+    path = os.path.join(EXPORT_DIR, f"{key}.{export_extension(sheets, fmt)}")
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None or (job.done() and (job.exception() is not None or not os.path.exists(path))):
+            os.makedirs(EXPORT_DIR, exist_ok=True)
+            job = _executor.submit(_build_export, sheets, fmt, path)
+            _jobs[key] = job
+    return job
+
+
+def available_formats():
+    formats = []
+    for fmt, module in (("xlsx", "xlsxwriter"), ("csv", None), ("parquet", "pyarrow")):
+        if module is None:
+            formats.append(fmt)
+            continue
+        try:
+            __import__(module)
+            formats.append(fmt)
+        except ImportError:
+            pass
+    return formats
+
+
+def export_panel(sheets, file_stem, key):
+    # Отчёт строится только по кнопке, в фоновом потоке; страница не ждёт его при каждом rerun
+    formats = available_formats()
+    fmt = st.selectbox("Формат", formats, key=f"{key}_format")
+    state_key = f"{key}_job"
+
+    # Задача хранится вместе с хэшем данных и формата: после смены входов старый файл больше не предлагается
+    if st.button("Подготовить отчёт", key=f"{key}_prepare"):
+        digest = frames_hash(sheets, fmt)
+        st.session_state[state_key] = {"hash": digest, "format": fmt, "job": submit_export(sheets, fmt, digest)}
+
+    saved = st.session_state.get(state_key)
+    if saved is None:
+        return
+    if saved["format"] != fmt or saved["hash"] != frames_hash(sheets, fmt):
+        del st.session_state[state_key]
+        return
+    job = saved["job"]
+    if not job.done():
+        st.info("Отчёт формируется в фоне…")
+        st.button("Обновить", key=f"{key}_refresh")
+        return
+    if job.exception() is not None:
+        st.error(f"Ошибка экспорта: {job.exception()}")
+        return
+
+    result = job.result()
+    path = result["path"]
+    if not saved.get("recorded"):
+        record_stage(f"export: build {fmt} (фон)", result["wall_ms"], result["cpu_ms"])
+        saved["recorded"] = True
+    if not os.path.exists(path):
+        del st.session_state[state_key]
+        st.info("Файл отчёта удалён по сроку хранения — подготовьте его заново")
+        return
+    ext = os.path.splitext(path)[1].lstrip(".")
+    with open(path, "rb") as f:
+        st.download_button(
+            "Скачать отчёт", f, file_name=f"{file_stem}.{ext}", mime=MIME_TYPES[ext], key=f"{key}_download"
+        )
@@ -1,9 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from export_helpers import export_panel
+from forecast_hierarchy import LEVELS, bottom_series, hierarchy_forecast, node_inputs, summing_matrix
+from forecast_model import complete_rows, forecast_regions
+from job_helpers import job_panel, run_job
+from perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="Прогноз по регионам и категориям", layout="wide")
 st.title("Калькулятор прогнозов по регионам и категориям")
+init_perf("forecast")
 
 # Исходные данные
 st.sidebar.header("Исходные параметры")
@@ -44,139 +50,85 @@ example_data = pd.DataFrame({
     "Издержки (%)": [5, 3, 4]
 })
 
-df_input = st.data_editor(example_data, num_rows="dynamic", use_container_width=True)
-
-# Расчёты
-def calculate_extended(row, scale_effect=True):
-    try:
-        if scale_effect:
-            scale_factor = min(1.0, 1000 / max(row.fact_sales, 1))
-            variable_costs_scaled = row.variable_costs * scale_factor
-            variable_cost_per_unit = variable_costs_scaled / row.fact_sales if row.fact_sales > 0 else 0
-        else:
-            variable_costs_scaled = row.variable_costs
-            variable_cost_per_unit = variable_costs_scaled / row.fact_sales if row.fact_sales > 0 else 0
-
-        def scaled_fixed_costs(base_fixed_costs, outlets):
-            steps = outlets // 10
-            return base_fixed_costs * (1 + steps * 0.15)
-
-        fixed_costs_scaled = scaled_fixed_costs(row.fixed_costs, row.n_outlets)
-
-        revenue = row.fact_sales * row.price
-        gross_profit = revenue - (row.fact_sales * row.cost) - variable_costs_scaled
-        taxable_base = gross_profit - fixed_costs_scaled
-        taxes = max(0, taxable_base * (row.tax_rate / 100))
-        net_profit = gross_profit - fixed_costs_scaled - taxes
-
-        romi = (row.marketing_impact / row.marketing_budget) * 100 if row.marketing_budget > 0 else 0
-        roi_region = (net_profit / (row.marketing_budget + fixed_costs_scaled + variable_costs_scaled)) * 100
-
-        return pd.Series([revenue, net_profit, romi, roi_region])
-    except Exception:
-        return pd.Series([None] * 4)
-
-def forecast_scenario(row, scenario_name, n_months, sales_growth, price_growth, cost_growth, marketing_growth,
-                      base_price, base_marketing_budget, base_plan_sales,
-                      price_elasticity, ad_elasticity, competitor_influence,
-                      scale_effect=True):
-    months, revenue_list, profit_list, romi_list, roi_list = [], [], [], [], []
-    for month in range(1, n_months + 1):
-        row = row.copy()
-        row.price *= (1 + price_growth / 100) ** month
-        row.cost *= (1 + cost_growth / 100) ** month
-        row.marketing_budget *= (1 + marketing_growth / 100) ** month
-        row.plan_sales *= (1 + sales_growth / 100) ** month
-
-        price_change = (row.price - base_price) / base_price if base_price else 0
-        ad_change = (row.marketing_budget - base_marketing_budget) / base_marketing_budget if base_marketing_budget else 0
-
-        delta_sales_price = price_elasticity * price_change
-        delta_sales_ad = ad_elasticity * ad_change
-        competition_effect = 1 / competitor_influence
-        sales_multiplier = (1 + delta_sales_price + delta_sales_ad) * competition_effect
-        row.fact_sales = max(0, row.plan_sales * sales_multiplier)
-
-        metrics = calculate_extended(row, scale_effect=scale_effect)
-        months.append(month)
-        revenue_list.append(metrics[0])
-        profit_list.append(metrics[1])
-        romi_list.append(metrics[2])
-        roi_list.append(metrics[3])
-
-    return pd.DataFrame({
-        "Месяц": months,
-        "Сценарий": scenario_name,
-        "Выручка": revenue_list,
-        "Чистая прибыль": profit_list,
-        "ROMI": romi_list,
-        "ROI региона": roi_list
-    })
-
-def apply_scenario(row, scenario: str):
-    row = row.copy()
-    if scenario == "Оптимистичный":
-        row.price *= 1.05
-        row.marketing_budget *= 1.3
-    elif scenario == "Пессимистичный":
-        row.price *= 0.95
-        row.marketing_budget *= 0.7
-    return row
-
-#Прогноз по всем строкам
-forecast_all = []
-
-for _, row_cfg in df_input.iterrows():
-    region = row_cfg["Регион"]
-    category = row_cfg["Категория"]
-    demand_coeff = row_cfg["Коэф. спроса"]
-    markup = row_cfg["Локальная наценка (%)"] / 100
-    extra_cost = row_cfg["Издержки (%)"] / 100
-
-    base_price_loc = price * (1 + markup)
-    cost_loc = cost * (1 + extra_cost)
-
-    row_local = pd.Series({
-        'product_name': category,
-        'price': base_price_loc,
-        'cost': cost_loc,
-        'plan_sales': plan_sales * demand_coeff,
-        'marketing_budget': marketing_budget,
-        'marketing_impact': marketing_impact,
-        'fixed_costs': fixed_costs,
-        'variable_costs': variable_costs,
-        'tax_rate': tax_rate,
-        'n_outlets': n_outlets,
-        'fact_sales': plan_sales
-    })
-
-    for scenario in ["Базовый", "Оптимистичный", "Пессимистичный"]:
-        scenario_row = apply_scenario(row_local.copy(), scenario)
-        df_forecast = forecast_scenario(
-            scenario_row, scenario, n_months,
-            monthly_sales_growth, monthly_price_growth, monthly_cost_growth, monthly_marketing_growth,
-            price, marketing_budget, plan_sales,
-            price_elasticity, ad_elasticity, competitor_influence,
-            scale_effect=scale_effect
-        )
-        df_forecast["Регион"] = region
-        df_forecast["Категория"] = category
-        forecast_all.append(df_forecast)
-
-forecast_total = pd.concat(forecast_all)
-
-# График
+df_edited = st.data_editor(example_data, num_rows="dynamic", use_container_width=True)
+df_input = complete_rows(df_edited)
+if df_input.empty:
+    st.warning("Заполните хотя бы одну строку: регион, категорию, коэффициент спроса, наценку и издержки.")
+    st.stop()
+if len(df_input) < len(df_edited):
+    st.warning(f"Незаполненные строки не учитываются в прогнозе: {len(df_edited) - len(df_input)}. "
+               "Для строки нужны регион, категория, коэффициент спроса, наценка и издержки.")
+
+#Прогноз по всем строкам: через общую очередь, одинаковые параметры из разных сессий берутся из кэша
+with stage("compute: forecast (queue)"):
+    model_args = (
+        price, cost, plan_sales, marketing_budget, marketing_impact,
+        fixed_costs, variable_costs, tax_rate, n_outlets, n_months,
+        monthly_sales_growth, monthly_price_growth, monthly_cost_growth, monthly_marketing_growth,
+        price_elasticity, ad_elasticity, competitor_influence,
+    )
+    forecast_total = run_job("forecast_regions", forecast_regions, df_input, *model_args, scale_effect=scale_effect)
+
+# График: при тысячах точек Plotly рисует линии через WebGL, а не SVG
+WEBGL_MIN_POINTS = 1000
+render_mode = "webgl" if len(forecast_total) >= WEBGL_MIN_POINTS else "auto"
+
 st.subheader("Динамика чистой прибыли по категориям и регионам")
-fig = px.line(
-    forecast_total,
-    x="Месяц",
-    y="Чистая прибыль",
-    color="Сценарий",
-    line_dash="Регион",
-    facet_col="Категория",
-    markers=True
-)
-st.plotly_chart(fig, use_container_width=True)
+with stage("render: chart"):
+    fig = px.line(
+        forecast_total,
+        x="Месяц",
+        y="Чистая прибыль",
+        color="Сценарий",
+        line_dash="Регион",
+        facet_col="Категория",
+        markers=True,
+        render_mode=render_mode
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
 st.subheader("Общий прогноз по всем данным")
-st.dataframe(forecast_total, use_container_width=True)
\ No newline at end of file
+with stage("render: table"):
+    st.dataframe(forecast_total, use_container_width=True)
+
+# Иерархия: итого, регионы, категории. Bottom-up — суммы нижних рядов; при согласовании модель считается
+# и прямо на агрегатах, выручка всех уровней сводится к согласованной (OLS / WLS по структуре),
+# а прибыль пересчитывается из неё
+st.subheader("Прогноз по уровням: итого, регионы, категории")
+RECONCILE_OPTIONS = {
+    "Сумма снизу (bottom-up)": None,
+    "Согласование OLS": "ols",
+    "Согласование WLS (структурное)": "wls_struct",
+}
+reconcile_label = st.radio("Верхние уровни", list(RECONCILE_OPTIONS), horizontal=True)
+reconcile_method = RECONCILE_OPTIONS[reconcile_label]
+
+with stage("compute: hierarchy"):
+    node_forecast = None
+    if reconcile_method:
+        S, nodes = summing_matrix(bottom_series(forecast_total))
+        node_forecast = run_job("forecast_regions", forecast_regions, node_inputs(df_input, S, nodes), *model_args,
+                                scale_effect=scale_effect)
+    hierarchy = hierarchy_forecast(forecast_total, n_months, node_forecast=node_forecast, method=reconcile_method)
+
+level = st.selectbox("Уровень", LEVELS[:3])
+level_forecast = hierarchy[hierarchy["Уровень"] == level]
+with stage("render: hierarchy"):
+    fig_level = px.line(
+        level_forecast,
+        x="Месяц",
+        y="Чистая прибыль",
+        color="Сценарий",
+        line_dash={"Итого": None, "Регион": "Регион", "Категория": "Категория"}[level],
+        markers=True,
+        render_mode="webgl" if len(level_forecast) >= WEBGL_MIN_POINTS else "auto"
+    )
+    st.plotly_chart(fig_level, use_container_width=True)
+    st.dataframe(level_forecast, use_container_width=True)
+
+st.subheader("Экспорт прогноза")
+with stage("export"):
+    export_panel({"Прогноз": forecast_total, "Иерархия": hierarchy}, "forecast", key="forecast_export")
+
+job_panel()
+perf_panel()
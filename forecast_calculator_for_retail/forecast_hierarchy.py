@@ -0,0 +1,193 @@
+# forecast_hierarchy.py
+# Иерархия прогноза: итого → регион / категория → регион × категория. Без Streamlit, как и forecast_model.
+# Суммирующая матрица S разреженная (4 единицы на нижний ряд), поэтому 100k нижних рядов не требуют плотных матриц.
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from forecast_model import SCENARIOS
+
+ALL = "Все"
+KEYS = ["Регион", "Категория"]
+LEVELS = ["Итого", "Регион", "Категория", "Регион × Категория"]
+ADDITIVE_METRICS = ["Выручка", "Чистая прибыль"]
+# Согласуется только выручка: прямой прогноз на агрегате сопоставим с суммой снизу. Издержки, маркетинг и налог
+# модель применяет к каждой строке (эффект масштаба, max(0, ·) в налоге), поэтому прибыль агрегата — не сумма
+# прибылей рядов; её пересчитывают из согласованной выручки
+RECONCILED_METRIC = "Выручка"
+RECONCILE_METHODS = ["ols", "wls_struct"]
+
+
+def summing_matrix(bottom):
+    # bottom — уникальные пары Регион/Категория (нижний уровень). Узлы идут по уровням: итого, регионы,
+    # категории, нижние ряды; S[node, b] = 1, если нижний ряд b входит в узел
+    n = len(bottom)
+    region_codes, regions = pd.factorize(bottom["Регион"], sort=True)
+    category_codes, categories = pd.factorize(bottom["Категория"], sort=True)
+    n_r, n_c = len(regions), len(categories)
+
+    rows = np.concatenate([np.zeros(n, dtype=np.int64), 1 + region_codes, 1 + n_r + category_codes,
+                           1 + n_r + n_c + np.arange(n)])
+    cols = np.tile(np.arange(n), 4)
+    S = sparse.csr_matrix((np.ones(4 * n), (rows, cols)), shape=(1 + n_r + n_c + n, n))
+
+    nodes = pd.DataFrame({
+        "Уровень": np.repeat(LEVELS, [1, n_r, n_c, n]),
+        "Регион": np.concatenate([[ALL], regions.astype(str), np.full(n_c, ALL), bottom["Регион"].astype(str)]),
+        "Категория": np.concatenate([[ALL], np.full(n_r, ALL), categories.astype(str),
+                                     bottom["Категория"].astype(str)]),
+    })
+    return S, nodes
+
+
+def _pairs(frame):
+    # Целый код пары Регион/Категория по строкам: строки сравниваются только на уникальных значениях
+    region, _ = pd.factorize(frame["Регион"])
+    category, categories = pd.factorize(frame["Категория"])
+    pair = region.astype(np.int64) * max(len(categories), 1) + category
+    _, first, inverse = np.unique(pair, return_index=True, return_inverse=True)
+    return first, inverse
+
+
+def bottom_series(forecast):
+    first, _ = _pairs(forecast)
+    return forecast[KEYS].iloc[first].astype(str).reset_index(drop=True)
+
+
+def locate(forecast, keys, n_months, scenarios=SCENARIOS):
+    # Позиции строк длинной таблицы в матрице: ряд среди keys и столбец сценарий/месяц; -1 — строки нет в иерархии
+    first, inverse = _pairs(forecast)
+    unique_keys = pd.MultiIndex.from_frame(forecast[KEYS].iloc[first].astype(str))
+    row = pd.MultiIndex.from_frame(keys[KEYS].astype(str)).get_indexer(unique_keys)[inverse]
+    codes, names = pd.factorize(forecast["Сценарий"])
+    scenario = np.append(pd.Index(scenarios).get_indexer(names), -1)[codes]
+    month = forecast["Месяц"].to_numpy()
+    valid = (row >= 0) & (scenario >= 0) & (month >= 1) & (month <= n_months)
+    return np.where(valid, row * len(scenarios) * n_months + scenario * n_months + month - 1, -1)
+
+
+def to_matrix(forecast, keys, metric, n_months, scenarios=SCENARIOS, positions=None):
+    # Длинная таблица прогноза -> матрица (ряды keys × столбцы сценарий/месяц); повторы ключей суммируются
+    if positions is None:
+        positions = locate(forecast, keys, n_months, scenarios)
+    valid = positions >= 0
+    n_cols = len(scenarios) * n_months
+    values = np.bincount(positions[valid], weights=forecast[metric].to_numpy(dtype=float)[valid],
+                         minlength=len(keys) * n_cols)
+    return values.reshape(len(keys), n_cols)
+
+
+def node_inputs(df_input, S, nodes):
+    # Параметры агрегированных узлов для прогноза "сверху": спрос суммируется,
+    # наценка и издержки — среднее, взвешенное по спросу. Из прогноза узлов берётся только RECONCILED_METRIC
+    bottom = df_input.groupby(KEYS, sort=False, as_index=False).agg({
+        "Коэф. спроса": "sum", "Локальная наценка (%)": "mean", "Издержки (%)": "mean"
+    })
+    order = pd.MultiIndex.from_frame(bottom[KEYS].astype(str)).get_indexer(
+        pd.MultiIndex.from_frame(nodes.loc[nodes["Уровень"] == LEVELS[3], KEYS])
+    )
+    if (order < 0).any():
+        # -1 в iloc молча взял бы последнюю строку: ряд без параметров (например, с пустым регионом) — ошибка входа
+        missing = nodes.loc[nodes["Уровень"] == LEVELS[3], KEYS].iloc[np.flatnonzero(order < 0)]
+        raise ValueError("Нет параметров для рядов: " + ", ".join(missing["Регион"] + " / " + missing["Категория"]))
+    bottom = bottom.iloc[order]
+    demand = bottom["Коэф. спроса"].to_numpy(dtype=float)
+    upper = nodes["Уровень"].to_numpy() != LEVELS[3]
+    S_upper = S[upper]
+    total = S_upper @ demand
+    with np.errstate(divide="ignore", invalid="ignore"):
+        markup = np.where(total > 0, S_upper @ (demand * bottom["Локальная наценка (%)"].to_numpy(dtype=float)) / total, 0)
+        extra = np.where(total > 0, S_upper @ (demand * bottom["Издержки (%)"].to_numpy(dtype=float)) / total, 0)
+    return nodes.loc[upper, KEYS].assign(**{
+        "Коэф. спроса": total, "Локальная наценка (%)": markup, "Издержки (%)": extra
+    }).reset_index(drop=True)
+
+
+def _weights(S, method):
+    # Обратные веса W^-1 (диагональ): OLS — единичные; WLS — по числу нижних рядов в узле.
+    # MinT нужны остатки прогнозов на истории, а калькулятор считает от плана без фактических продаж
+    if method == "ols":
+        return np.ones(S.shape[0])
+    if method == "wls_struct":
+        return 1.0 / np.asarray(S.sum(axis=1)).ravel()
+    raise ValueError(f"Неизвестный метод согласования: {method}")
+
+
+def _block_cg(S, w_inv, rhs, tol=1e-10, maxiter=1000):
+    # (S' W^-1 S) X = rhs для всех столбцов сразу: сопряжённые градиенты с диагональным предобуславливателем,
+    # матрица системы не строится — только умножения на разреженную S
+    def apply(X):
+        return S.T @ (w_inv[:, None] * (S @ X))
+
+    diag = (S.T @ w_inv)[:, None]
+    X = rhs / diag
+    R = rhs - apply(X)
+    Z = R / diag
+    P = Z.copy()
+    rz = (R * Z).sum(axis=0)
+    target = tol * np.maximum(np.linalg.norm(rhs, axis=0), 1e-300)
+    for _ in range(maxiter):
+        if (np.linalg.norm(R, axis=0) <= target).all():
+            break
+        AP = apply(P)
+        pap = (P * AP).sum(axis=0)
+        alpha = np.divide(rz, pap, out=np.zeros_like(rz), where=pap > 0)
+        X += alpha * P
+        R -= alpha * AP
+        Z = R / diag
+        rz_new = (R * Z).sum(axis=0)
+        beta = np.divide(rz_new, rz, out=np.zeros_like(rz), where=rz > 0)
+        P = Z + beta * P
+        rz = rz_new
+    return X
+
+
+def reconcile(S, base, method="ols"):
+    # Согласование прогнозов всех узлов: y~ = S (S' W^-1 S)^-1 S' W^-1 y^
+    w_inv = _weights(S, method)
+    bottom = _block_cg(S, w_inv, S.T @ (w_inv[:, None] * base))
+    return S @ bottom
+
+
+def hierarchy_forecast(forecast, n_months, metrics=ADDITIVE_METRICS, node_forecast=None, method=None):
+    # Прогнозы всех уровней иерархии в длинном формате.
+    # Без node_forecast верхние уровни — суммы снизу (одно умножение S на все месяцы/сценарии сразу);
+    # с node_forecast (прогнозы, посчитанные прямо на агрегатах) — согласование выручки методом method,
+    # остальные метрики нижнего ряда масштабируются на отношение согласованной выручки к исходной (маржа ряда
+    # сохраняется) и суммируются снизу, так что при согласованных исходных прогнозах ответ совпадает с bottom-up
+    bottom = bottom_series(forecast)
+    S, nodes = summing_matrix(bottom)
+    upper = nodes.loc[nodes["Уровень"] != LEVELS[3]]
+
+    reconciled = node_forecast is not None and method is not None
+    positions = locate(forecast, bottom, n_months)
+    node_positions = locate(node_forecast, upper, n_months) if reconciled else None
+
+    ratio = None
+    if reconciled:
+        revenue = to_matrix(forecast, bottom, RECONCILED_METRIC, n_months, positions=positions)
+        base = np.vstack([to_matrix(node_forecast, upper, RECONCILED_METRIC, n_months, positions=node_positions),
+                          revenue])
+        revenue_bottom = reconcile(S, base, method)[len(upper):]
+        ratio = np.divide(revenue_bottom, revenue, out=np.ones_like(revenue), where=revenue != 0)
+
+    result = {}
+    for metric in metrics:
+        if ratio is not None and metric == RECONCILED_METRIC:
+            result[metric] = S @ revenue_bottom
+            continue
+        values = to_matrix(forecast, bottom, metric, n_months, positions=positions)
+        result[metric] = S @ (values if ratio is None else values * ratio)
+
+    # Подписи узлов — категориальные: на 100k рядов × месяцы × сценарии строковые колонки строились бы дольше расчёта
+    n_nodes, n_cols = len(nodes), len(SCENARIOS) * n_months
+    repeat = np.repeat(np.arange(n_nodes), n_cols)
+    table = pd.DataFrame({col: pd.Categorical(nodes[col]) for col in nodes})
+    table = pd.DataFrame({col: pd.Categorical.from_codes(table[col].cat.codes.to_numpy()[repeat],
+                                                         table[col].cat.categories) for col in table})
+    table["Сценарий"] = pd.Categorical.from_codes(np.tile(np.repeat(np.arange(len(SCENARIOS)), n_months), n_nodes),
+                                                  SCENARIOS)
+    table["Месяц"] = np.tile(np.arange(1, n_months + 1), n_nodes * len(SCENARIOS))
+    for metric, values in result.items():
+        table[metric] = values.ravel()
+    return table
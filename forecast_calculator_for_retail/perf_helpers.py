@@ -0,0 +1,126 @@
+# perf_helpers.py
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# PERF_LOG_JSON=1 — каждая стадия дополнительно пишется в лог одной JSON-строкой
+LOG_JSON = os.environ.get("PERF_LOG_JSON") == "1"
+logger = logging.getLogger("calc.perf")
+if LOG_JSON and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+# tracemalloc один на процесс: он включён, пока замер памяти отмечен хотя бы в одной сессии.
+# Сессия, которая не перезапускалась дольше MEMORY_SESSION_TTL_S (закрытая вкладка), перестаёт учитываться.
+MEMORY_SESSION_TTL_S = 600
+_memory_sessions = {}
+_memory_lock = threading.Lock()
+_tracing_owned = False
+
+
+def _sync_memory_tracking():
+    global _tracing_owned
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx is not None else None
+    now = time.monotonic()
+    with _memory_lock:
+        if st.session_state.get("perf_tracemalloc", False):
+            _memory_sessions[session_id] = now
+        else:
+            _memory_sessions.pop(session_id, None)
+        for expired in [sid for sid, seen in _memory_sessions.items() if now - seen > MEMORY_SESSION_TTL_S]:
+            del _memory_sessions[expired]
+
+        if _memory_sessions and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        elif not _memory_sessions and _tracing_owned:
+            # Трассировку, включённую не нами (python -X tracemalloc), не выключаем
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+def init_perf(page):
+    # Вызывается в начале страницы: замеры копятся заново на каждый rerun
+    st.session_state["_perf_page"] = page
+    st.session_state["_perf_stages"] = []
+    _sync_memory_tracking()
+
+
+def _memory_enabled():
+    return st.session_state.get("perf_tracemalloc", False) and tracemalloc.is_tracing()
+
+
+def record_stage(name, wall_ms, cpu_ms, mem_mb=None):
+    # Замер, снятый вне stage() — например, фоновая сборка отчёта в рабочем потоке
+    record = {
+        "page": st.session_state.get("_perf_page"),
+        "stage": name,
+        "wall_ms": wall_ms,
+        "cpu_ms": cpu_ms,
+        "mem_mb": mem_mb,
+    }
+    st.session_state.setdefault("_perf_stages", []).append(record)
+    if LOG_JSON:
+        logger.info(json.dumps({"ts": time.time(), **record}, ensure_ascii=False))
+
+
+@contextmanager
+def stage(name):
+    # Пик tracemalloc не сбрасывается: он общий на процесс, и сброс из одной сессии портил бы замеры другой.
+    # Вместо пика — изменение отслеживаемой памяти за стадию (тоже по всему процессу)
+    track_memory = _memory_enabled()
+    if track_memory:
+        mem_start = tracemalloc.get_traced_memory()[0]
+
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        mem_mb = None
+        if track_memory:
+            mem_mb = (tracemalloc.get_traced_memory()[0] - mem_start) / 2**20
+        record_stage(
+            name,
+            (time.perf_counter() - start_wall) * 1000,
+            # thread_time: в Streamlit у каждой сессии свой поток, чужая нагрузка не попадает в замер
+            (time.thread_time() - start_cpu) * 1000,
+            mem_mb,
+        )
+
+
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def perf_panel():
+    with st.expander("Performance", expanded=False):
+        records = st.session_state.get("_perf_stages", [])
+        if records:
+            table = pd.DataFrame(records).drop(columns=["page"])
+            st.dataframe(table.style.format({"wall_ms": "{:.1f}", "cpu_ms": "{:.1f}", "mem_mb": "{:+.2f}"},
+                                            na_rep="—"))
+            st.caption(f"Всего: {table['wall_ms'].sum():.1f} мс")
+            if table["mem_mb"].notna().any():
+                st.caption("mem_mb — изменение памяти под tracemalloc за стадию по всему процессу: "
+                           "в него попадают и расчёты других сессий.")
+        else:
+            st.caption("Замеров на этом запуске нет.")
+        st.checkbox("Замерять память (tracemalloc, замедляет расчёты во всём процессе)", key="perf_tracemalloc")
@@ -1,55 +1,74 @@
 # pages/1_Retention.py
 import streamlit as st
 import pandas as pd
-import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
+from io import BytesIO
+from utils.plot_helpers import heatmap
+from utils.retention_index import ActivityIndex, parse_brackets
+from utils.perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="Retention Analysis", layout="wide")
 st.title("Retention Analysis")
+init_perf("retention")
 
-st.markdown("Загрузите файл с колонками: `user_id`, `install_date`, `event_date`")
+st.markdown("""
+Загрузите файл с колонками: `user_id`, `install_date`, `event_date`.
+Периоды отсчитываются от дня установки пользователя; недозревшие периоды когорты остаются пустыми.
+""")
 
 uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
 
+PERIODS = {"День": (1, "D"), "Неделя": (7, "W"), "Месяц": (30, "M")}
+RETENTION_TYPES = ["Классический", "Rolling (вернулся в период N или позже)", "Bracket (свои интервалы в днях)"]
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_activity_index(file_bytes):
+    # Индекс строится один раз на файл; все виды retention дальше считаются по нему без повторного groupby
+    df = pd.read_csv(BytesIO(file_bytes), parse_dates=["install_date", "event_date"])
+    return ActivityIndex.from_events(df)
+
+
 if uploaded_file:
-    df = pd.read_csv(uploaded_file, parse_dates=["install_date", "event_date"])
-
-    period_type = st.selectbox("Группировать по", ["День", "Неделя", "Месяц"])
-
-    if period_type == "День":
-        df['install_period'] = df['install_date'].dt.to_period('D').apply(lambda r: r.start_time)
-        df['event_period'] = df['event_date'].dt.to_period('D').apply(lambda r: r.start_time)
-        period_label = 'день'
-    elif period_type == "Неделя":
-        df['install_period'] = df['install_date'].dt.to_period('W').apply(lambda r: r.start_time)
-        df['event_period'] = df['event_date'].dt.to_period('W').apply(lambda r: r.start_time)
-        period_label = 'неделю'
-    else:
-        df['install_period'] = df['install_date'].dt.to_period('M').apply(lambda r: r.start_time)
-        df['event_period'] = df['event_date'].dt.to_period('M').apply(lambda r: r.start_time)
-        period_label = 'месяц'
+    with stage("ingest: csv + activity index"):
+        index = load_activity_index(uploaded_file.getvalue())
 
-    df['retention_period'] = ((df['event_period'] - df['install_period']).dt.days //
-                              (1 if period_type == 'День' else (7 if period_type == 'Неделя' else 30)))
+    period_type = st.selectbox("Группировать по", list(PERIODS))
+    retention_type = st.selectbox("Тип retention", RETENTION_TYPES)
+    period_days, freq = PERIODS[period_type]
+    max_periods = max(-(-index.max_days // period_days), 1)
 
-    cohort = df.groupby(['install_period', 'retention_period'])['user_id'].nunique().reset_index()
-    cohort_pivot = cohort.pivot(index='install_period', columns='retention_period', values='user_id')
+    if retention_type == RETENTION_TYPES[2]:
+        try:
+            brackets = parse_brackets(st.text_input("Интервалы (дни с установки, конец не включается)", "0-1, 1-7, 7-30, 30+"))
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+    else:
+        n_periods = st.slider("Число периодов", 1, max_periods, min(12, max_periods))
 
-    cohort_sizes = cohort_pivot.iloc[:, 0]
-    retention = cohort_pivot.divide(cohort_sizes, axis=0)
+    with stage("compute: retention"):
+        if retention_type == RETENTION_TYPES[0]:
+            retention = index.classic(period_days, n_periods, freq)
+        elif retention_type == RETENTION_TYPES[1]:
+            retention = index.rolling(period_days, n_periods, freq)
+        else:
+            retention = index.bracket(brackets, freq)
 
     st.subheader("\U0001F4CA Retention Table")
-    st.dataframe(retention.fillna(0).style.format("{:.2%}"))
+    with stage("render: table"):
+        # NaN — период ещё не наступил для когорты: показывается пустой ячейкой, а не 0%
+        st.dataframe(retention.style.format("{:.2%}", na_rep=""))
 
     st.subheader("\U0001F525 Retention Heatmap")
-    fig, ax = plt.subplots(figsize=(12, 6))
-    sns.heatmap(retention.fillna(0), annot=True, fmt=".0%", cmap="Blues", ax=ax)
-    st.pyplot(fig)
+    with stage("render: heatmap"):
+        heatmap(retention, fmt=".0%", cmap="Blues")
 
     with st.expander("Скачать retention-таблицу"):
-        csv = retention.fillna(0).to_csv(index=True).encode('utf-8')
+        with stage("export: csv"):
+            csv = retention.to_csv(index=True).encode('utf-8')
         st.download_button("Скачать CSV", csv, file_name="retention_analysis.csv", mime='text/csv')
 
 else:
     st.info("Ожидается загрузка CSV-файла.")
+
+perf_panel()
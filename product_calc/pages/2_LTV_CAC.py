@@ -2,9 +2,12 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
+from utils.plot_helpers import show_figure
+from utils.perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="LTV & CAC Calculator", layout="wide")
 st.title("LTV / CAC Calculator")
+init_perf("ltv_cac")
 
 st.markdown("""
 Введите данные вручную или загрузите файл со столбцами:
@@ -14,7 +17,8 @@ st.markdown("""
 uploaded_file = st.file_uploader("Загрузите CSV (необязательно)", type=["csv"])
 
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    with stage("ingest: csv"):
+        df = pd.read_csv(uploaded_file)
 else:
     st.subheader("Ввод вручную")
     with st.form("manual_input"):
@@ -35,24 +39,30 @@ else:
         }])
 
 if 'df' in locals():
-    df['LTV'] = df['ARPU'] * df['Retention'] * df['Margin']
-    df['ROMI'] = df['LTV'] / df['CAC']
-    df['Payback_Period'] = df['CAC'] / (df['ARPU'] * df['Margin'])
-    df['Profit_per_User'] = df['LTV'] - df['CAC']
+    with stage("compute: metrics"):
+        df['LTV'] = df['ARPU'] * df['Retention'] * df['Margin']
+        df['ROMI'] = df['LTV'] / df['CAC']
+        df['Payback_Period'] = df['CAC'] / (df['ARPU'] * df['Margin'])
+        df['Profit_per_User'] = df['LTV'] - df['CAC']
 
     st.subheader("Результаты расчета")
-    st.dataframe(df.style.format("{:.2f}"))
+    with stage("render: table"):
+        st.dataframe(df.style.format("{:.2f}"))
 
     st.subheader("Сравнение LTV и CAC")
-    fig, ax = plt.subplots(figsize=(8, 4))
-    ax.bar(df['segment'], df['LTV'], label='LTV')
-    ax.bar(df['segment'], df['CAC'], label='CAC', alpha=0.7)
-    ax.set_ylabel("$")
-    ax.legend()
-    st.pyplot(fig)
+    with stage("render: chart"):
+        fig, ax = plt.subplots(figsize=(8, 4))
+        ax.bar(df['segment'], df['LTV'], label='LTV')
+        ax.bar(df['segment'], df['CAC'], label='CAC', alpha=0.7)
+        ax.set_ylabel("$")
+        ax.legend()
+        show_figure(fig)
 
     with st.expander("Скачать результаты"):
-        csv = df.to_csv(index=False).encode('utf-8')
+        with stage("export: csv"):
+            csv = df.to_csv(index=False).encode('utf-8')
         st.download_button("Скачать CSV", csv, file_name="ltv_cac_results.csv", mime='text/csv')
 else:
     st.info("Ожидается ввод данных или загрузка файла.")
+
+perf_panel()
@@ -4,14 +4,16 @@ import pandas as pd
 import numpy as np
 from scipy.stats import beta, norm
 import json
-import os
-from io import BytesIO
-import yaml
 import matplotlib.pyplot as plt
-from utils.calc_helpers import pairwise_z_test
+from utils.calc_helpers import eb_shrinkage, pairwise_z_test
+from utils.plot_helpers import show_figure
+from utils.export_helpers import export_panel
+from utils.experiment_store import ExperimentStore, STATUSES
+from utils.perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="A/B Test Calculator", layout="wide")
 st.title("A/B/n Test Calculator")
+init_perf("ab_test")
 
 st.markdown("""
 Введите данные по группам, чтобы рассчитать статистическую значимость A/B/n теста и сравнить варианты.
@@ -20,16 +22,24 @@ st.markdown("""
 
 st.subheader("Ввод данных")
 
+store = ExperimentStore()
 load_exp = st.file_uploader("Загрузить конфигурацию эксперимента (YAML или JSON)", type=["yaml", "json"])
+stored_exp = st.selectbox("...или открыть из архива", [""] + store.list_experiments()["name"].tolist())
 
 if load_exp:
-    content = load_exp.read()
-    if load_exp.name.endswith(".yaml"):
-        loaded_data = yaml.safe_load(content)
-    else:
-        loaded_data = json.loads(content)
+    with stage("ingest: config"):
+        content = load_exp.read()
+        if load_exp.name.endswith(".yaml"):
+            import yaml
+            loaded_data = yaml.safe_load(content)
+        else:
+            loaded_data = json.loads(content)
     groups = pd.DataFrame(loaded_data)
     st.success("Конфигурация успешно загружена")
+elif stored_exp:
+    with stage("ingest: archive"):
+        groups = store.load(stored_exp)
+    st.success(f"Эксперимент {stored_exp} загружен из архива")
 else:
     st.markdown("Добавьте 2+ групп (название, кол-во пользователей, число конверсий)")
     groups = st.data_editor(
@@ -51,12 +61,13 @@ else:
     groups["CI_low"] = groups["Конверсия"] - z * groups["SE"]
     groups["CI_high"] = groups["Конверсия"] + z * groups["SE"]
 
-    fig_ci, ax_ci = plt.subplots(figsize=(8, 5))
-    ax_ci.errorbar(groups["Группа"], groups["Конверсия"],
-                   yerr=z * groups["SE"], fmt='o', capsize=5)
-    ax_ci.set_title("Доверительные интервалы конверсий")
-    ax_ci.set_ylabel("Конверсия")
-    st.pyplot(fig_ci)
+    with stage("render: ci chart"):
+        fig_ci, ax_ci = plt.subplots(figsize=(8, 5))
+        ax_ci.errorbar(groups["Группа"], groups["Конверсия"],
+                       yerr=z * groups["SE"], fmt='o', capsize=5)
+        ax_ci.set_title("Доверительные интервалы конверсий")
+        ax_ci.set_ylabel("Конверсия")
+        show_figure(fig_ci)
 
     # Расчёт длительности эксперимента
     st.subheader("⏱ Расчёт длительности эксперимента")
@@ -76,42 +87,106 @@ else:
     revenue_per_user = st.number_input("Доход на пользователя ($)", value=20.0, step=1.0)
     cost_per_user = st.number_input("Стоимость привлечения ($)", value=10.0, step=1.0)
     groups["ROMI"] = (groups["Конверсия"] * revenue_per_user - cost_per_user) / cost_per_user
-    fig_romi, ax_romi = plt.subplots(figsize=(8, 4))
-    ax_romi.bar(groups["Группа"], groups["ROMI"])
-    ax_romi.set_title("ROMI по группам")
-    ax_romi.set_ylabel("ROMI")
-    st.pyplot(fig_romi)
+    with stage("render: romi chart"):
+        fig_romi, ax_romi = plt.subplots(figsize=(8, 4))
+        ax_romi.bar(groups["Группа"], groups["ROMI"])
+        ax_romi.set_title("ROMI по группам")
+        ax_romi.set_ylabel("ROMI")
+        show_figure(fig_romi)
 
     # Попарные сравнения
     st.subheader("Попарное сравнение (Z-тест)")
-    results = pairwise_z_test(groups)
+    with stage("compute: pairwise z-test"):
+        results = pairwise_z_test(groups)
     st.dataframe(pd.DataFrame(results).style.format({"Разница": "{:.2%}", "p-value": "{:.4f}"}))
 
     # Bayesian
     st.subheader("Bayesian A/B")
     st.markdown("Сравнение через распределения Beta (априори = 1, 1)")
-    fig, ax = plt.subplots(figsize=(10, 5))
-    x = np.linspace(0, 1, 500)
-    for idx, row in groups.iterrows():
-        a, b = row["Конверсии"] + 1, row["Пользователи"] - row["Конверсии"] + 1
-        ax.plot(x, beta.pdf(x, a, b), label=f"{row['Группа']}")
-    ax.set_title("Beta distributions")
-    ax.legend()
-    st.pyplot(fig)
-
-    # Экспорт YAML конфигурации
-    st.subheader("Сохранение эксперимента в YAML")
-    exp_name = st.text_input("Название эксперимента", "experiment_1")
-    if st.button("Сохранить как YAML"):
-        os.makedirs("data/experiments", exist_ok=True)
-        with open(f"data/experiments/{exp_name}.yaml", "w") as f:
-            yaml.dump(groups.to_dict(orient="list"), f, allow_unicode=True)
-        st.success(f"Сохранено в data/experiments/{exp_name}.yaml")
+    with stage("render: beta chart"):
+        fig, ax = plt.subplots(figsize=(10, 5))
+        x = np.linspace(0, 1, 500)
+        for idx, row in groups.iterrows():
+            a, b = row["Конверсии"] + 1, row["Пользователи"] - row["Конверсии"] + 1
+            ax.plot(x, beta.pdf(x, a, b), label=f"{row['Группа']}")
+        ax.set_title("Beta distributions")
+        ax.legend()
+        show_figure(fig)
+
+    # Сохранение в архив экспериментов
+    st.subheader("Сохранение эксперимента")
+    exp_name = st.text_input("Название эксперимента", stored_exp or "experiment_1")
+    col_metric, col_status = st.columns(2)
+    exp_metric = col_metric.text_input("Метрика", "conversion")
+    exp_status = col_status.selectbox("Статус", STATUSES)
+    if st.button("Сохранить в архив"):
+        store.save(exp_name, groups, metric=exp_metric, status=exp_status)
+        st.success(f"Эксперимент {exp_name} сохранён в {store.path}")
 
     # Экспорт Excel
     st.subheader("Экспорт результатов")
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer) as writer:
-        groups.to_excel(writer, sheet_name="Groups", index=False)
-        pd.DataFrame(results).to_excel(writer, sheet_name="Pairwise Test", index=False)
-    st.download_button("⬇Скачать Excel отчет", buffer.getvalue(), file_name="abtest_report.xlsx")
+    with stage("export"):
+        export_panel({"Groups": groups, "Pairwise Test": pd.DataFrame(results)}, "abtest_report", key="abtest_export")
+
+# Срезы: Empirical Bayes
+st.subheader("Анализ по срезам (Empirical Bayes)")
+st.markdown("""
+CSV с колонками `Сегмент`, `Группа`, `Пользователи`, `Конверсии` — по строке на ячейку срез × группа
+(например, страна × платформа × канал). Общий Beta-априор оценивается по всем ячейкам сразу,
+поэтому маленькие ячейки сжимаются к общей конверсии и не дают ложных победителей.
+""")
+segments_file = st.file_uploader("Загрузить срезы (CSV)", type=["csv"], key="eb_segments")
+if segments_file:
+    with stage("ingest: segments"):
+        segment_cells = pd.read_csv(segments_file)
+    control_group = st.selectbox("Контрольная группа", segment_cells["Группа"].unique().tolist())
+    with stage("compute: empirical bayes"):
+        cells, comparisons, prior = eb_shrinkage(segment_cells, control=control_group)
+    st.markdown(f"**Общий априор:** Beta({prior['alpha']:.1f}, {prior['beta']:.1f}), "
+                f"средняя конверсия {prior['alpha'] / (prior['alpha'] + prior['beta']):.2%}")
+    if not prior["reliable"]:
+        st.warning("Сжатие ненадёжно: ячеек меньше трёх или разброса между ними не видно. "
+                   "Использован слабый априор — оценки близки к сырым конверсиям ячеек.")
+    with stage("render: empirical bayes"):
+        st.dataframe(comparisons.sort_values("P(лучше контроля)", ascending=False).style.format({
+            "Разница": "{:.2%}", "Разница EB": "{:.2%}", "P(лучше контроля)": "{:.1%}"
+        }), use_container_width=True)
+        with st.expander("Конверсии по ячейкам"):
+            st.dataframe(cells.style.format({
+                "Конверсия": "{:.2%}", "Конверсия EB": "{:.2%}", "CI_low": "{:.2%}", "CI_high": "{:.2%}"
+            }), use_container_width=True)
+
+# Архив экспериментов
+st.subheader("Архив экспериментов")
+with st.expander("Импорт старых YAML/JSON из data/experiments"):
+    if st.button("Импортировать"):
+        with stage("ingest: bulk import"):
+            imported, failed = store.import_files("data/experiments")
+        st.success(f"Импортировано экспериментов: {imported}")
+        for path, error in failed:
+            st.warning(f"{path}: {error}")
+
+col_name, col_metric, col_status = st.columns(3)
+filter_name = col_name.text_input("Название содержит", "")
+filter_metric = col_metric.selectbox("Метрика", [""] + store.metrics(), key="filter_metric")
+filter_status = col_status.selectbox("Статус", [""] + STATUSES, key="filter_status")
+filter_dates = st.date_input("Период создания", value=(), key="filter_dates")
+
+with stage("compute: archive query"):
+    archive = store.list_experiments(
+        name_like=filter_name or None,
+        metric=filter_metric or None,
+        status=filter_status or None,
+        date_from=filter_dates[0] if len(filter_dates) > 0 else None,
+        date_to=filter_dates[1] if len(filter_dates) > 1 else None,
+    )
+st.caption(f"Найдено экспериментов: {len(archive)}")
+st.dataframe(archive, use_container_width=True)
+
+selected = st.multiselect("Эксперименты для пересчёта", archive["name"].tolist())
+if selected and st.button("Пересчитать выбранные"):
+    with stage("compute: batch pairwise"):
+        batch_results = store.reanalyze(selected)
+    st.dataframe(batch_results.style.format({"Разница": "{:.2%}", "p-value": "{:.4f}"}), use_container_width=True)
+
+perf_panel()
@@ -1,12 +1,16 @@
 # pages/4_Cohort_Analysis.py
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from io import BytesIO
+from utils.calc_helpers import cohort_tables
+from utils.plot_helpers import heatmap
+from utils.export_helpers import export_panel
+from utils.job_helpers import job_panel, run_job
+from utils.perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="Cohort Analysis", layout="wide")
 st.title("Когортный анализ пользователей")
+init_perf("cohort_analysis")
 
 st.markdown("""
 Загрузите CSV с полями `user_id`, `install_date`, `event_date`, `revenue`, чтобы провести когортный анализ:
@@ -17,35 +21,36 @@ st.markdown("""
 
 file = st.file_uploader("Загрузите CSV", type=["csv"])
 
-if file:
-    df = pd.read_csv(file, parse_dates=["install_date", "event_date"])
-    df["install_month"] = df["install_date"].dt.to_period("M").dt.to_timestamp()
-    df["event_month"] = df["event_date"].dt.to_period("M").dt.to_timestamp()
-    df["cohort_period"] = ((df["event_month"] - df["install_month"]) / np.timedelta64(1, 'M')).round().astype("int")
 
-    cohort_data = df.groupby(["install_month", "cohort_period"])\
-        .agg(users=("user_id", "nunique"), revenue=("revenue", "sum")).reset_index()
+def load_cohorts(file_bytes):
+    # Чтение и сводные таблицы — в общей очереди; один и тот же файл из любой сессии считается один раз
+    df = pd.read_csv(BytesIO(file_bytes), parse_dates=["install_date", "event_date"])
+    return cohort_tables(df)
 
-    cohort_pivot = cohort_data.pivot(index="install_month", columns="cohort_period", values="users")
-    base_users = cohort_pivot.iloc[:, 0]
-    retention = cohort_pivot.divide(base_users, axis=0)
 
-    st.subheader("Retention (по месяцам)")
-    st.dataframe(retention.fillna(0).style.format("{:.2%}"))
+if file:
+    with stage("ingest + compute: cohorts (queue)"):
+        cohort_data, retention, ltv = run_job("cohort_tables", load_cohorts, file.getvalue())
 
-    fig1, ax1 = plt.subplots(figsize=(12, 6))
-    sns.heatmap(retention.fillna(0), annot=True, fmt=".0%", cmap="YlGnBu", ax=ax1)
-    st.pyplot(fig1)
+    st.subheader("Retention (по месяцам)")
+    with stage("render: retention table"):
+        st.dataframe(retention.fillna(0).style.format("{:.2%}"))
 
-    revenue_pivot = cohort_data.pivot(index="install_month", columns="cohort_period", values="revenue")
-    revenue_per_user = revenue_pivot.divide(cohort_pivot)
-    ltv = revenue_per_user.cumsum(axis=1)
+    with stage("render: retention heatmap"):
+        heatmap(retention.fillna(0), fmt=".0%", cmap="YlGnBu")
 
     st.subheader("LTV когорт")
-    st.dataframe(ltv.fillna(0).style.format("{:.2f}"))
+    with stage("render: ltv table"):
+        st.dataframe(ltv.fillna(0).style.format("{:.2f}"))
+
+    with stage("render: ltv heatmap"):
+        heatmap(ltv.fillna(0), fmt=".1f", cmap="Oranges")
 
-    fig2, ax2 = plt.subplots(figsize=(12, 6))
-    sns.heatmap(ltv.fillna(0), annot=True, fmt=".1f", cmap="Oranges", ax=ax2)
-    st.pyplot(fig2)
+    st.subheader("Экспорт когорт")
+    with stage("export"):
+        export_panel({"Retention": retention, "LTV": ltv, "Cohorts": cohort_data}, "cohort_analysis", key="cohort_export")
 else:
     st.info("Загрузите CSV-файл с нужными полями для анализа.")
+
+job_panel()
+perf_panel()
@@ -3,9 +3,12 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from utils.plot_helpers import show_figure
+from utils.perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="Product Financial Model", layout="wide")
 st.title("Финансовая модель продукта")
+init_perf("fin_modeling")
 
 st.markdown("""
 Прогнозируйте выручку, LTV, прибыль и оценивайте сценарии Best/Base/Worst:
@@ -29,11 +32,12 @@ st.subheader("What-if симуляция")
 conv_change = st.slider("Изменение ARPU (%)", -50, 50, 0)
 ret_change = st.slider("Изменение Retention (%)", -50, 50, 0)
 
-data["ARPU_adj"] = data["ARPU"] * (1 + conv_change / 100)
-data["Retention_adj"] = data["Retention"] * (1 + ret_change / 100)
-data["LTV"] = data["ARPU_adj"] * data["Retention_adj"] * data["Margin"]
-data["Revenue"] = data["Пользователи"] * data["ARPU_adj"]
-data["Total_LTV"] = data["Пользователи"] * data["LTV"]
+with stage("compute: what-if"):
+    data["ARPU_adj"] = data["ARPU"] * (1 + conv_change / 100)
+    data["Retention_adj"] = data["Retention"] * (1 + ret_change / 100)
+    data["LTV"] = data["ARPU_adj"] * data["Retention_adj"] * data["Margin"]
+    data["Revenue"] = data["Пользователи"] * data["ARPU_adj"]
+    data["Total_LTV"] = data["Пользователи"] * data["LTV"]
 
 st.subheader("Финансовый прогноз")
 display_df = data[["Сегмент", "Пользователи", "ARPU_adj", "Retention_adj", "LTV", "Revenue", "Total_LTV"]] \
@@ -49,13 +53,14 @@ st.dataframe(display_df.style.format({
 }))
 
 
-fig, ax = plt.subplots(figsize=(10, 5))
-ax.bar(data["Сегмент"], data["Revenue"], label="Revenue")
-ax.bar(data["Сегмент"], data["Total_LTV"], bottom=data["Revenue"], label="Total LTV", alpha=0.5)
-ax.set_ylabel("$")
-ax.set_title("Выручка и пожизненная ценность")
-ax.legend()
-st.pyplot(fig)
+with stage("render: chart"):
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.bar(data["Сегмент"], data["Revenue"], label="Revenue")
+    ax.bar(data["Сегмент"], data["Total_LTV"], bottom=data["Revenue"], label="Total LTV", alpha=0.5)
+    ax.set_ylabel("$")
+    ax.set_title("Выручка и пожизненная ценность")
+    ax.legend()
+    show_figure(fig)
 
 st.subheader("Сценарный анализ")
 scenarios = pd.DataFrame({
@@ -77,3 +82,4 @@ st.dataframe(scenarios.style.format({
     "Total_LTV": "{:,.0f}"
 }))
 
+perf_panel()
@@ -1,11 +1,18 @@
 # pages/6_Marketing_Analytics.py
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from io import BytesIO
+from utils.attribution import PathStats
+from utils.funnel_engine import ALL_CHANNELS, ordered_funnel_csv, parse_windows
+from utils.plot_helpers import show_figure
+from utils.perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="Marketing Analytics", layout="wide")
 st.title("Маркетинговая аналитика")
+init_perf("marketing_analytics")
 
 st.markdown("""
 Этот модуль включает:
@@ -15,12 +22,74 @@ st.markdown("""
 - Канальный анализ
 """)
 
-# Ввод данных воронки
+
+# Файлы больше лимита загрузки администратор кладёт в CALC_DATA_DIR; со страницы выбирается только имя файла оттуда,
+# произвольные пути и URL не принимаются
+DATA_DIR = os.environ.get("CALC_DATA_DIR")
+
+
+def data_dir_files():
+    if not DATA_DIR or not os.path.isdir(DATA_DIR):
+        return []
+    return sorted(entry.name for entry in os.scandir(DATA_DIR) if entry.is_file() and entry.name.endswith(".csv"))
+
+
+def data_dir_path(name):
+    if name not in data_dir_files():
+        raise ValueError(f"Файла {name!r} нет в каталоге данных")
+    return os.path.join(DATA_DIR, name)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_funnel(source, steps, windows):
+    # source — байты загруженного CSV или путь к файлу из каталога данных; лог читается чанками и считается по партициям
+    return ordered_funnel_csv(BytesIO(source) if isinstance(source, bytes) else source, list(steps), list(windows))
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_attribution(source):
+    # Матрица переходов копится по чанкам файла путей (байты загрузки или файл из каталога данных);
+    # на выходе last touch, Markov и Shapley по каналам
+    return PathStats.from_csv(BytesIO(source) if isinstance(source, bytes) else source).table()
+
+
+# Воронка из сырого лога событий: user_id, event, timestamp, channel
+funnel = None
+with st.expander("Воронка из лога событий", expanded=False):
+    st.caption("Шаги засчитываются строго по порядку; окно шага — максимальное время от предыдущего шага. "
+               "Канал пользователя — канал первого шага.")
+    log_file = st.file_uploader("Лог событий (CSV: user_id, event, timestamp, channel)", type=["csv"],
+                                key="funnel_log")
+    log_path = None
+    if data_dir_files():
+        log_name = st.selectbox("Или файл из каталога данных сервера", [""] + data_dir_files(), key="funnel_log_name")
+        log_path = data_dir_path(log_name) if log_name else None
+    steps_text = st.text_input("Шаги воронки по порядку (показы, клики, лиды, клиенты)", "view, click, lead, purchase")
+    windows_text = st.text_input("Окна конверсии для шагов", "—, 1d, 7d, 30d")
+    steps = tuple(step.strip() for step in steps_text.split(",") if step.strip())
+
+    if (log_file or log_path) and len(steps) != 4:
+        st.error("Нужно ровно 4 шага: показы, клики, лиды, клиенты")
+    elif log_file or log_path:
+        try:
+            windows = tuple(parse_windows(windows_text, len(steps)))
+            with stage("compute: funnel"):
+                funnel = load_funnel(log_file.getvalue() if log_file else log_path, steps, windows)
+            with stage("render: funnel"):
+                conversion = funnel.div(funnel[steps[0]].replace(0, np.nan), axis=0)
+                st.dataframe(funnel)
+                st.dataframe(conversion.style.format("{:.2%}", na_rep="—"))
+        except Exception as e:
+            st.error(f"Не удалось посчитать воронку: {e}")
+            funnel = None
+
+# Ввод данных воронки; при загруженном логе значения по умолчанию берутся из него
 st.subheader("Маркетинговая воронка")
-views = st.number_input("Показы", min_value=1, value=10000)
-clicks = st.number_input("Клики", min_value=0, value=1500)
-leads = st.number_input("Лиды", min_value=0, value=300)
-clients = st.number_input("Клиенты", min_value=0, value=60)
+totals = funnel.loc[ALL_CHANNELS].astype(int).tolist() if funnel is not None else [10000, 1500, 300, 60]
+views = st.number_input("Показы", min_value=1, value=max(totals[0], 1))
+clicks = st.number_input("Клики", min_value=0, value=totals[1])
+leads = st.number_input("Лиды", min_value=0, value=totals[2])
+clients = st.number_input("Клиенты", min_value=0, value=totals[3])
 cost = st.number_input("Общий бюджет кампании ($)", min_value=0.0, value=1500.0)
 
 ctr = clicks / views
@@ -55,27 +124,77 @@ st.markdown(f"**Прогнозируемый ROI:** {sim_roi:.2%}")
 
 # Канальный анализ
 st.subheader("Канальный анализ")
-channels = st.data_editor(pd.DataFrame({
-    "Канал": ["Facebook", "Google", "Email", "SEO"],
-    "Бюджет": [500, 600, 200, 200],
-    "Клики": [800, 1000, 300, 200],
-    "Клиенты": [30, 40, 10, 5]
-}), num_rows="dynamic")
 
-channels["CTR"] = channels["Клики"] / views
-channels["CPA"] = channels["Бюджет"] / channels["Клиенты"]
-channels["ROAS"] = (channels["Клиенты"] * 100) / channels["Бюджет"]
+attribution = None
+with st.expander("Атрибуция клиентов по путям касаний", expanded=False):
+    st.caption("Файл путей: path (\"Facebook > Google > Email\"), conversions и, если есть, nulls — "
+               "пути без конверсии. Markov делит конверсии по эффекту удаления канала из цепи переходов, "
+               "Shapley — поровну между каналами каждого пути.")
+    paths_file = st.file_uploader("Пути пользователей (CSV)", type=["csv"], key="attribution_paths")
+    paths_path = None
+    if data_dir_files():
+        paths_name = st.selectbox("Или файл путей из каталога данных сервера", [""] + data_dir_files(),
+                                  key="attribution_paths_name")
+        paths_path = data_dir_path(paths_name) if paths_name else None
+    attribution_model = st.selectbox("Модель атрибуции", ["Markov", "Shapley", "Last touch"])
+    if paths_file or paths_path:
+        try:
+            with stage("compute: attribution"):
+                attribution = load_attribution(paths_file.getvalue() if paths_file else paths_path)
+            st.dataframe(attribution.style.format("{:.2f}"))
+            if attribution_model not in attribution:
+                st.warning("Shapley недоступен для более чем 64 каналов, используется Markov")
+                attribution_model = "Markov"
+        except Exception as e:
+            st.error(f"Не удалось посчитать атрибуцию: {e}")
+            attribution = None
+
+if funnel is not None:
+    # Каналы из лога; бюджет в логе не хранится — по умолчанию делится пропорционально кликам
+    by_channel = funnel.drop(index=ALL_CHANNELS)
+    click_share = by_channel[steps[1]] / max(by_channel[steps[1]].sum(), 1)
+    channel_defaults = pd.DataFrame({
+        "Канал": by_channel.index.astype(str),
+        "Бюджет": (click_share * cost).round().to_numpy(),
+        "Клики": by_channel[steps[1]].to_numpy(),
+        "Клиенты": by_channel[steps[3]].to_numpy(),
+    })
+else:
+    channel_defaults = pd.DataFrame({
+        "Канал": ["Facebook", "Google", "Email", "SEO"],
+        "Бюджет": [500, 600, 200, 200],
+        "Клики": [800, 1000, 300, 200],
+        "Клиенты": [30, 40, 10, 5]
+    })
+if attribution is not None:
+    # Клиенты по каналам — из выбранной модели атрибуции; каналы без бюджета и кликов добавляются с нулями
+    attributed = attribution[attribution_model].round().astype(int)
+    channel_defaults = channel_defaults.set_index("Канал").reindex(
+        channel_defaults["Канал"].tolist() + [ch for ch in attributed.index if ch not in set(channel_defaults["Канал"])]
+    ).fillna(0)
+    channel_defaults["Клиенты"] = attributed.reindex(channel_defaults.index, fill_value=0)
+    channel_defaults = channel_defaults.rename_axis("Канал").reset_index()
+channels = st.data_editor(channel_defaults, num_rows="dynamic")
+
+with stage("compute: channels"):
+    channels["CTR"] = channels["Клики"] / views
+    # Нулевой бюджет или ноль клиентов — метрика не определена (каналы из атрибуции без бюджета)
+    channels["CPA"] = channels["Бюджет"] / channels["Клиенты"].replace(0, np.nan)
+    channels["ROAS"] = (channels["Клиенты"] * 100) / channels["Бюджет"].replace(0, np.nan)
 
 st.dataframe(channels.style.format({
     "Бюджет": "${:,.0f}",
     "CTR": "{:.2%}",
     "CPA": "${:,.2f}",
     "ROAS": "{:.2f}x"
-}))
-
-fig, ax = plt.subplots(figsize=(10, 5))
-ax.bar(channels["Канал"], channels["ROAS"], color="skyblue")
-ax.set_title("ROAS по каналам")
-ax.set_ylabel("ROAS (x)")
-ax.axhline(1, color='red', linestyle='--')
-st.pyplot(fig)
+}, na_rep="—"))
+
+with stage("render: roas chart"):
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.bar(channels["Канал"], channels["ROAS"], color="skyblue")
+    ax.set_title("ROAS по каналам")
+    ax.set_ylabel("ROAS (x)")
+    ax.axhline(1, color='red', linestyle='--')
+    show_figure(fig)
+
+perf_panel()
@@ -2,10 +2,14 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import io
+from utils.calc_helpers import unit_economics_table
+from utils.plot_helpers import show_figure
+from utils.export_helpers import export_panel
+from utils.perf_helpers import init_perf, perf_panel, stage
 
 st.set_page_config(page_title="Unit Economics", layout="wide")
 st.title("Юнит-экономика")
+init_perf("unit_economics")
 
 st.markdown("""
 Анализируйте экономику продукта по ключевым метрикам:
@@ -33,66 +37,54 @@ for i in range(segments):
         retention = st.slider(f"Retention (мес) - {name}", 1, 36, 6, key=f"retention_{i}")
         gpm = st.slider(f"Валовая маржа (%) - {name}", 0, 100, 70, key=f"gpm_{i}")
 
-    arpu = revenue / users
-    arppu = revenue / paying
-    cac = marketing / paying if paying > 0 else 0
-    ltv = arpu * retention * (gpm / 100)
-    ltv_cac = ltv / cac if cac > 0 else 0
-    payback = cac / (arpu * (gpm / 100)) if arpu > 0 else 0
-    contribution = arpu - var_cost
-    retention_cost = var_cost * retention
-
     segment_data.append({
-        "Сегмент": name,
-        "ARPU": arpu,
-        "ARPPU": arppu,
-        "CAC": cac,
-        "LTV": ltv,
-        "LTV/CAC": ltv_cac,
-        "Payback": payback,
-        "Contribution Margin": contribution,
-        "Retention Cost": retention_cost,
-        "GPM (%)": gpm
+        "name": name,
+        "users": users,
+        "paying": paying,
+        "revenue": revenue,
+        "marketing": marketing,
+        "var_cost": var_cost,
+        "retention": retention,
+        "gpm": gpm
     })
 
 # Таблица результатов
-df = pd.DataFrame(segment_data)
+with stage("compute: unit economics"):
+    df = unit_economics_table(pd.DataFrame(segment_data))
 st.subheader("Сравнительная таблица по сегментам")
 st.dataframe(df.style.format("{:.2f}"))
 
 # Визуализация сравнения LTV/CAC
 st.subheader("Сравнение LTV/CAC по сегментам")
 if not df.empty:
-    fig_ltv_cac, ax_ltv_cac = plt.subplots(figsize=(10, 4))
-    ax_ltv_cac.bar(df["Сегмент"], df["LTV/CAC"], color="skyblue")
-    ax_ltv_cac.set_ylabel("LTV/CAC")
-    ax_ltv_cac.set_title("Сравнение LTV/CAC по сегментам")
-    st.pyplot(fig_ltv_cac)
+    with stage("render: ltv/cac chart"):
+        fig_ltv_cac, ax_ltv_cac = plt.subplots(figsize=(10, 4))
+        ax_ltv_cac.bar(df["Сегмент"], df["LTV/CAC"], color="skyblue")
+        ax_ltv_cac.set_ylabel("LTV/CAC")
+        ax_ltv_cac.set_title("Сравнение LTV/CAC по сегментам")
+        show_figure(fig_ltv_cac)
 
 # График окупаемости для первого сегмента
 st.subheader("Окупаемость по первому сегменту")
-if segment_data:
-    first = segment_data[0]
+if not df.empty:
+    first = df.iloc[0]
     months = list(range(1, int(retention)+1))
     cumulative = [first['ARPU'] * m * (first['GPM (%)'] / 100) for m in months]
     cac_line = [first['CAC']] * len(months)
 
-    fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(months, cumulative, label="Кумулятивный доход", linewidth=2)
-    ax.plot(months, cac_line, '--', label="CAC", color='red')
-    ax.set_xlabel("Месяц")
-    ax.set_ylabel("$")
-    ax.set_title(f"Окупаемость: {first['Сегмент']}")
-    ax.legend()
-    st.pyplot(fig)
+    with stage("render: payback chart"):
+        fig, ax = plt.subplots(figsize=(10, 4))
+        ax.plot(months, cumulative, label="Кумулятивный доход", linewidth=2)
+        ax.plot(months, cac_line, '--', label="CAC", color='red')
+        ax.set_xlabel("Месяц")
+        ax.set_ylabel("$")
+        ax.set_title(f"Окупаемость: {first['Сегмент']}")
+        ax.legend()
+        show_figure(fig)
+
+# Экспорт
+st.subheader("Экспорт отчёта")
+with stage("export"):
+    export_panel({"Unit Economics": df}, "unit_economics", key="unit_export")
 
-# Экспорт в Excel
-st.subheader("Экспорт в Excel")
-excel_buffer = io.BytesIO()
-df.to_excel(excel_buffer, index=False, engine='openpyxl')
-st.download_button(
-    label="Скачать таблицу Excel",
-    data=excel_buffer.getvalue(),
-    file_name="unit_economics.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-)
+perf_panel()
@@ -0,0 +1,156 @@
+# utils/attribution.py
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+
+from utils.funnel_engine import ValueCodes
+
+# Состояния цепи: 0 — старт, 1 — конверсия, 2 — отказ, дальше каналы
+START, CONVERSION, NULL, FIRST_CHANNEL = 0, 1, 2, 3
+MASK_BITS = 64  # Shapley хранит набор каналов пути битовой маской
+
+
+class PathStats:
+    # Агрегаты путей касаний: разреженная матрица счётчиков переходов и конверсии по наборам каналов.
+    # Копится по чанкам, поэтому файлы путей на десятки миллионов строк не загружаются целиком.
+    def __init__(self):
+        self.codes = ValueCodes()
+        self._triplets = []
+        self._sets = []
+        self.total_conversions = 0.0
+        self.total_paths = 0.0
+
+    @property
+    def channels(self):
+        return list(self.codes.values)
+
+    def add(self, chunk, path_col="path", conv_col="conversions", null_col="nulls", sep=">"):
+        # Одинаковые пути сначала схлопываются: строки разбиваются только у уникальных путей
+        conversions = chunk[conv_col].astype(float)
+        nulls = chunk[null_col].astype(float) if null_col in chunk else pd.Series(0.0, index=chunk.index)
+        paths = pd.DataFrame({"path": chunk[path_col], "conv": conversions, "null": nulls})
+        paths = paths.groupby("path", sort=False).sum()
+        if paths.empty:
+            return self
+
+        touches = paths.index.to_series().str.split(sep).explode().str.strip()
+        touches = touches[touches != ""]
+        path_id = paths.index.get_indexer(touches.index)
+        state = self.codes.encode(touches.to_numpy()).astype(np.int64) + FIRST_CHANNEL
+        conv, null = paths["conv"].to_numpy(), paths["null"].to_numpy()
+        total = conv + null
+
+        # Переходы без циклов по путям: старт → первый канал, канал → следующий канал, последний → исход
+        first = np.r_[True, path_id[1:] != path_id[:-1]]
+        last = np.r_[path_id[1:] != path_id[:-1], True]
+        inner = ~last
+        rows = np.concatenate([np.full(first.sum(), START), state[inner], state[last], state[last]])
+        cols = np.concatenate([state[first], state[1:][inner[:-1]], np.full(last.sum(), CONVERSION),
+                               np.full(last.sum(), NULL)])
+        weights = np.concatenate([total[path_id[first]], total[path_id[inner]], conv[path_id[last]],
+                                  null[path_id[last]]])
+        counts = sparse.coo_matrix((weights, (rows, cols)), shape=(state.max() + 1,) * 2)
+        counts.sum_duplicates()
+        self._triplets.append((counts.row, counts.col, counts.data))
+
+        # Набор каналов пути — для Shapley; при числе каналов больше 64 маски не строятся
+        if len(self.codes.values) <= MASK_BITS:
+            bits = np.left_shift(np.uint64(1), (state - FIRST_CHANNEL).astype(np.uint64))
+            starts = np.flatnonzero(first)
+            masks = np.bitwise_or.reduceat(bits, starts)
+            self._sets.append(pd.Series(conv[path_id[starts]], index=masks).groupby(level=0).sum())
+
+        self.total_conversions += conv.sum()
+        self.total_paths += total.sum()
+        return self
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        return cls().add(df, **kwargs)
+
+    @classmethod
+    def from_csv(cls, source, chunksize=1_000_000, path_col="path", conv_col="conversions", null_col="nulls",
+                 sep=">"):
+        # Файл путей: path ("Facebook > Google > Email"), conversions и, если есть, nulls — пути без конверсии
+        stats = cls()
+        header = pd.read_csv(source, nrows=0).columns
+        if hasattr(source, "seek"):
+            source.seek(0)
+        usecols = [col for col in (path_col, conv_col, null_col) if col in header]
+        for chunk in pd.read_csv(source, usecols=usecols, chunksize=chunksize):
+            stats.add(chunk, path_col=path_col, conv_col=conv_col, null_col=null_col, sep=sep)
+        return stats
+
+    def transition_counts(self):
+        n_states = FIRST_CHANNEL + len(self.channels)
+        if not self._triplets:
+            return sparse.csr_matrix((n_states, n_states))
+        rows, cols, data = (np.concatenate(parts) for parts in zip(*self._triplets))
+        return sparse.csr_matrix((data, (rows, cols)), shape=(n_states, n_states))
+
+    def _absorbing_system(self):
+        # Переходные состояния — старт и каналы; конверсия и отказ поглощающие
+        counts = self.transition_counts()
+        transient = np.r_[START, np.arange(FIRST_CHANNEL, counts.shape[0])]
+        row_totals = np.asarray(counts.sum(axis=1)).ravel()[transient]
+        scale = sparse.diags(np.divide(1.0, row_totals, out=np.zeros_like(row_totals), where=row_totals > 0))
+        probs = scale @ counts[transient]
+        return probs[:, transient].tocsc(), np.asarray(probs[:, [CONVERSION]].todense()).ravel()
+
+    @staticmethod
+    def _conversion_probability(q, r):
+        identity = sparse.identity(q.shape[0], format="csc")
+        return float(np.atleast_1d(spsolve(identity - q, r))[0])
+
+    def removal_effects(self):
+        # Доля конверсий, теряемых без канала: канал превращается в отказ (его строка обнуляется)
+        q, r = self._absorbing_system()
+        base = self._conversion_probability(q, r) if len(r) else 0.0
+        effects = np.zeros(len(self.channels))
+        if base <= 0:
+            return pd.Series(effects, index=self.channels)
+        q = q.tolil()
+        for i in range(len(self.channels)):
+            row = 1 + i
+            q_removed = q.copy()
+            q_removed.rows[row], q_removed.data[row] = [], []
+            r_removed = r.copy()
+            r_removed[row] = 0.0
+            effects[i] = 1 - self._conversion_probability(q_removed.tocsc(), r_removed) / base
+        return pd.Series(effects, index=self.channels)
+
+    def markov(self):
+        effects = self.removal_effects()
+        share = effects / effects.sum() if effects.sum() > 0 else effects
+        return share * self.total_conversions
+
+    def shapley(self):
+        # Характеристическая функция v(S) — конверсии путей, все каналы которых входят в S. Это сумма игр
+        # единогласия по наборам путей, поэтому точное значение Шепли — конверсии набора поровну между его каналами:
+        # phi_i = sum_{T ∋ i} w(T) / |T|, без перебора 2^n коалиций и без сэмплирования перестановок.
+        if len(self.channels) > MASK_BITS:
+            raise ValueError(f"Shapley поддерживает до {MASK_BITS} каналов")
+        if not self._sets:
+            return pd.Series(0.0, index=self.channels)
+        sets = pd.concat(self._sets).groupby(level=0).sum()
+        masks = sets.index.to_numpy(dtype=np.uint64)
+        members = (masks[:, None] >> np.arange(len(self.channels), dtype=np.uint64)) & np.uint64(1)
+        members = members.astype(bool)
+        weights = sets.to_numpy() / members.sum(axis=1)
+        return pd.Series(members.T.astype(float) @ weights, index=self.channels)
+
+    def last_touch(self):
+        counts = self.transition_counts()
+        return pd.Series(np.asarray(counts[FIRST_CHANNEL:, CONVERSION].todense()).ravel(), index=self.channels)
+
+    def table(self, shapley=True):
+        result = pd.DataFrame({
+            "Last touch": self.last_touch(),
+            "Removal effect": self.removal_effects(),
+            "Markov": self.markov(),
+        })
+        if shapley and len(self.channels) <= MASK_BITS:
+            result["Shapley"] = self.shapley()
+        result.index.name = "channel"
+        return result
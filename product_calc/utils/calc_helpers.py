@@ -1,6 +1,7 @@
 # utils/calc_helpers.py
 import numpy as np
-from scipy.stats import norm
+# ndtr — это norm.cdf без тяжёлого импорта scipy.stats
+from scipy.special import betaincinv, betaln, digamma, ndtr
 
 def z_test_conversion(n1, c1, n2, c2):
     p1 = c1 / n1
@@ -8,7 +9,7 @@ def z_test_conversion(n1, c1, n2, c2):
     p_pool = (c1 + c2) / (n1 + n2)
     se = np.sqrt(p_pool * (1 - p_pool) * (1 / n1 + 1 / n2))
     z = (p2 - p1) / se
-    p_val = 2 * (1 - norm.cdf(abs(z)))
+    p_val = 2 * (1 - ndtr(abs(z)))
     return {
         "p1": p1,
         "p2": p2,
@@ -17,19 +18,176 @@ def z_test_conversion(n1, c1, n2, c2):
         "p_value": p_val
     }
 
+def pairwise_z_test_batch(groups, experiment_col="Эксперимент"):
+    # Все пары групп внутри каждого эксперимента одним векторным расчётом;
+    # порядок пар такой же, как у вложенного цикла i < j
+    df = groups[[experiment_col, "Группа", "Пользователи", "Конверсии"]].copy()
+    df["_pos"] = df.groupby(experiment_col, sort=False).cumcount()
+    pairs = df.merge(df, on=experiment_col, suffixes=("_1", "_2"))
+    pairs = pairs[pairs["_pos_1"] < pairs["_pos_2"]]
+
+    n1 = pairs["Пользователи_1"].to_numpy(dtype=float)
+    c1 = pairs["Конверсии_1"].to_numpy(dtype=float)
+    n2 = pairs["Пользователи_2"].to_numpy(dtype=float)
+    c2 = pairs["Конверсии_2"].to_numpy(dtype=float)
+    p1 = c1 / n1
+    p2 = c2 / n2
+    p_pool = (c1 + c2) / (n1 + n2)
+    se = np.sqrt(p_pool * (1 - p_pool) * (1 / n1 + 1 / n2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (p2 - p1) / se
+    p_val = 2 * (1 - ndtr(np.abs(z)))
+
+    return pairs[[experiment_col, "Группа_1", "Группа_2"]].rename(columns={
+        "Группа_1": "Группа 1",
+        "Группа_2": "Группа 2",
+    }).assign(**{
+        "Разница": p2 - p1,
+        "Z-значение": z,
+        "p-value": p_val,
+    }).reset_index(drop=True)
+
+
 def pairwise_z_test(df):
-    results = []
-    for i in range(len(df)):
-        for j in range(i + 1, len(df)):
-            g1 = df.iloc[i]
-            g2 = df.iloc[j]
-            result = z_test_conversion(g1['Пользователи'], g1['Конверсии'],
-                                       g2['Пользователи'], g2['Конверсии'])
-            results.append({
-                "Группа 1": g1["Группа"],
-                "Группа 2": g2["Группа"],
-                "Разница": result["diff"],
-                "Z-значение": result["z"],
-                "p-value": result["p_value"]
-            })
-    return results
+    batch = pairwise_z_test_batch(df.assign(_experiment=0), experiment_col="_experiment")
+    return batch.drop(columns="_experiment").to_dict(orient="records")
+
+
+def cohort_tables(df):
+    # Месячные когорты: df с колонками user_id, install_date, event_date, revenue
+    df = df.assign(
+        install_month=df["install_date"].dt.to_period("M").dt.to_timestamp(),
+        event_month=df["event_date"].dt.to_period("M").dt.to_timestamp(),
+    )
+    df["cohort_period"] = ((df["event_month"].dt.year - df["install_month"].dt.year) * 12 +
+                           (df["event_month"].dt.month - df["install_month"].dt.month))
+
+    cohort_data = df.groupby(["install_month", "cohort_period"])\
+        .agg(users=("user_id", "nunique"), revenue=("revenue", "sum")).reset_index()
+
+    cohort_pivot = cohort_data.pivot(index="install_month", columns="cohort_period", values="users")
+    base_users = cohort_pivot.iloc[:, 0]
+    retention = cohort_pivot.divide(base_users, axis=0)
+
+    revenue_pivot = cohort_data.pivot(index="install_month", columns="cohort_period", values="revenue")
+    revenue_per_user = revenue_pivot.divide(cohort_pivot)
+    ltv = revenue_per_user.cumsum(axis=1)
+    return cohort_data, retention, ltv
+
+
+def unit_economics_table(segments):
+    # segments: name, users, paying, revenue, marketing, var_cost, retention, gpm — по строке на сегмент
+    users = segments["users"].to_numpy(dtype=float)
+    paying = segments["paying"].to_numpy(dtype=float)
+    revenue = segments["revenue"].to_numpy(dtype=float)
+    marketing = segments["marketing"].to_numpy(dtype=float)
+    var_cost = segments["var_cost"].to_numpy(dtype=float)
+    retention = segments["retention"].to_numpy(dtype=float)
+    margin = segments["gpm"].to_numpy(dtype=float) / 100
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        arpu = revenue / users
+        arppu = revenue / paying
+        cac = np.where(paying > 0, marketing / paying, 0.0)
+        ltv = arpu * retention * margin
+        ltv_cac = np.where(cac > 0, ltv / cac, 0.0)
+        payback = np.where(arpu > 0, cac / (arpu * margin), 0.0)
+
+    return segments[["name"]].rename(columns={"name": "Сегмент"}).assign(**{
+        "ARPU": arpu,
+        "ARPPU": arppu,
+        "CAC": cac,
+        "LTV": ltv,
+        "LTV/CAC": ltv_cac,
+        "Payback": payback,
+        "Contribution Margin": arpu - var_cost,
+        "Retention Cost": var_cost * retention,
+        "GPM (%)": segments["gpm"].to_numpy(),
+    })
+
+
+EB_MIN_CELLS = 3  # по меньшему числу ячеек разброс между ними не оценить
+EB_WEAK_STRENGTH = 2.0  # слабый априор: вес двух наблюдений вокруг общей конверсии
+
+
+def _weak_prior(mean):
+    return float(mean * EB_WEAK_STRENGTH), float((1 - mean) * EB_WEAK_STRENGTH)
+
+
+def fit_beta_prior(conversions, users, method="mle"):
+    # Общий Beta(alpha, beta) априор по всем ячейкам: метод моментов, затем (по умолчанию) уточнение MLE.
+    # Возвращает (alpha, beta, reliable); при reliable=False вместо оценки взят слабый или урезанный априор
+    c = np.asarray(conversions, dtype=float)
+    n = np.asarray(users, dtype=float)
+    # Ячейки без пользователей ничего не говорят о разбросе, а их 0/0 превратило бы априор в NaN
+    c, n = c[n > 0], n[n > 0]
+    if n.sum() == 0:
+        return 1.0, 1.0, False
+    mean = c.sum() / n.sum()
+    if len(n) < EB_MIN_CELLS or c.sum() == 0 or c.sum() == n.sum():
+        mean = min(max(mean, 0.5 / n.sum()), 1 - 0.5 / n.sum())
+        return (*_weak_prior(mean), False)
+
+    rates = c / n
+    observed_var = np.average((rates - mean) ** 2, weights=n)
+    # Часть разброса объясняется биномиальным шумом малых ячеек; остаток — реальная разница между ячейками
+    binomial_var = mean * (1 - mean) * len(n) / n.sum()
+    between_var = max(observed_var - binomial_var, 1e-12)
+    strength = max(mean * (1 - mean) / between_var - 1, 1e-3)
+    alpha, beta = mean * strength, (1 - mean) * strength
+
+    if method == "mle":
+        from scipy.optimize import minimize
+
+        def neg_loglik(log_params):
+            a, b = np.exp(log_params)
+            ll = np.sum(betaln(c + a, n - c + b)) - len(n) * betaln(a, b)
+            d_n = digamma(n + a + b)
+            grad_a = np.sum(digamma(c + a) - d_n) - len(n) * (digamma(a) - digamma(a + b))
+            grad_b = np.sum(digamma(n - c + b) - d_n) - len(n) * (digamma(b) - digamma(a + b))
+            return -ll, -np.array([grad_a * a, grad_b * b])
+
+        result = minimize(neg_loglik, np.log([alpha, beta]), jac=True, method="L-BFGS-B",
+                          bounds=[(-10, 20), (-10, 20)])
+        # Упор в границу значит, что различий между ячейками не видно и сила априора уходит в бесконечность
+        if not result.success or np.any(result.x >= 20 - 1e-6):
+            return (*_weak_prior(mean), False)
+        alpha, beta = np.exp(result.x)
+
+    # Априор не весит больше, чем все данные вместе: иначе ячейки сжимаются в одну точку и P(B > A) → 0.5
+    strength = alpha + beta
+    if strength > n.sum():
+        return float(mean * n.sum()), float((1 - mean) * n.sum()), False
+    return float(alpha), float(beta), True
+
+
+def eb_shrinkage(df, segment_col="Сегмент", group_col="Группа", control=None, ci=0.95, method="mle"):
+    # Иерархическая beta-binomial модель по всем ячейкам сегмент × группа сразу:
+    # общий априор, сжатые апостериорные конверсии с интервалами и P(группа > контроль) в каждом сегменте
+    users = df["Пользователи"].to_numpy(dtype=float)
+    conversions = df["Конверсии"].to_numpy(dtype=float)
+    alpha, beta, reliable = fit_beta_prior(conversions, users, method=method)
+
+    post_a = alpha + conversions
+    post_b = beta + users - conversions
+    tail = (1 - ci) / 2
+    cells = df[[segment_col, group_col, "Пользователи", "Конверсии"]].reset_index(drop=True).assign(**{
+        "Конверсия": np.divide(conversions, users, out=np.full_like(users, np.nan), where=users > 0),
+        "Конверсия EB": post_a / (post_a + post_b),
+        "CI_low": betaincinv(post_a, post_b, tail),
+        "CI_high": betaincinv(post_a, post_b, 1 - tail),
+    })
+    cells["_var"] = post_a * post_b / ((post_a + post_b) ** 2 * (post_a + post_b + 1))
+
+    control = control if control is not None else cells[group_col].iloc[0]
+    base = cells[cells[group_col] == control][[segment_col, "Конверсия", "Конверсия EB", "_var"]]
+    pairs = cells[cells[group_col] != control].merge(base, on=segment_col, suffixes=("", "_control"))
+    # Нормальная аппроксимация разности двух Beta: точна при десятках конверсий и считается без сэмплирования
+    diff = pairs["Конверсия EB"] - pairs["Конверсия EB_control"]
+    comparisons = pairs[[segment_col, group_col]].assign(**{
+        "Контроль": control,
+        "Разница": pairs["Конверсия"] - pairs["Конверсия_control"],
+        "Разница EB": diff,
+        "P(лучше контроля)": ndtr(diff / np.sqrt(pairs["_var"] + pairs["_var_control"])),
+    })
+    return cells.drop(columns="_var"), comparisons, {"alpha": alpha, "beta": beta, "reliable": reliable}
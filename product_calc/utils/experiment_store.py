@@ -0,0 +1,192 @@
+# utils/experiment_store.py
+import glob
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from utils.calc_helpers import pairwise_z_test_batch
+
+DEFAULT_DB_PATH = "data/experiments.sqlite"
+STATUSES = ["draft", "running", "finished", "archived"]
+GROUP_COLUMNS = ["Группа", "Пользователи", "Конверсии"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    metric TEXT NOT NULL DEFAULT 'conversion',
+    status TEXT NOT NULL DEFAULT 'draft',
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS experiment_groups (
+    experiment_id INTEGER NOT NULL REFERENCES experiments(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    group_name TEXT NOT NULL,
+    users INTEGER NOT NULL,
+    conversions INTEGER NOT NULL,
+    PRIMARY KEY (experiment_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_experiments_created_at ON experiments(created_at);
+CREATE INDEX IF NOT EXISTS idx_experiments_metric ON experiments(metric, created_at);
+CREATE INDEX IF NOT EXISTS idx_experiments_status ON experiments(status, created_at);
+"""
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _read_config(path):
+    # Формат файлов из data/experiments: dict колонок (yaml.dump(groups.to_dict(orient="list"))) или список строк
+    with open(path, "rb") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        return json.loads(content)
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(content, Loader=loader)
+
+
+class ExperimentStore:
+    # Индексированный реестр экспериментов в SQLite: имя, дата, метрика, статус + группы отдельной таблицей
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Соединение на вызов: Streamlit выполняет сессии в разных потоках
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @staticmethod
+    def _group_rows(groups):
+        groups = pd.DataFrame(groups)[GROUP_COLUMNS]
+        return [
+            (position, str(name), int(users), int(conversions))
+            for position, (name, users, conversions) in enumerate(groups.itertuples(index=False, name=None))
+        ]
+
+    def _write(self, conn, name, groups, metric, status, created_at, source):
+        conn.execute(
+            """
+            INSERT INTO experiments (name, created_at, metric, status, source) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                created_at = excluded.created_at, metric = excluded.metric,
+                status = excluded.status, source = excluded.source
+            """,
+            (name, created_at or _now(), metric, status, source),
+        )
+        experiment_id = conn.execute("SELECT id FROM experiments WHERE name = ?", (name,)).fetchone()[0]
+        conn.execute("DELETE FROM experiment_groups WHERE experiment_id = ?", (experiment_id,))
+        conn.executemany(
+            "INSERT INTO experiment_groups VALUES (?, ?, ?, ?, ?)",
+            [(experiment_id, *row) for row in self._group_rows(groups)],
+        )
+
+    def save(self, name, groups, metric="conversion", status="draft", created_at=None, source="app"):
+        with closing(self._connect()) as conn, conn:
+            self._write(conn, name, groups, metric, status, created_at, source)
+
+    def load(self, name):
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                """
+                SELECT g.group_name AS "Группа", g.users AS "Пользователи", g.conversions AS "Конверсии"
+                FROM experiment_groups g JOIN experiments e ON e.id = g.experiment_id
+                WHERE e.name = ? ORDER BY g.position
+                """,
+                conn,
+                params=(name,),
+            )
+
+    def delete(self, name):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM experiments WHERE name = ?", (name,))
+
+    def import_files(self, directory="data/experiments", status="finished"):
+        # Массовый импорт старых YAML/JSON одной транзакцией; дата берётся из времени изменения файла
+        paths = sorted(glob.glob(os.path.join(directory, "*.yaml")) + glob.glob(os.path.join(directory, "*.json")))
+        imported, failed = 0, []
+        with closing(self._connect()) as conn, conn:
+            for path in paths:
+                try:
+                    groups = pd.DataFrame(_read_config(path))
+                    created_at = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    self._write(conn, name, groups, "conversion", status, created_at, path)
+                    imported += 1
+                except Exception as e:
+                    failed.append((path, str(e)))
+        return imported, failed
+
+    def list_experiments(self, name_like=None, metric=None, status=None, date_from=None, date_to=None, limit=None):
+        conditions, params = [], []
+        if name_like:
+            conditions.append("e.name LIKE ?")
+            params.append(f"%{name_like}%")
+        if metric:
+            conditions.append("e.metric = ?")
+            params.append(metric)
+        if status:
+            conditions.append("e.status = ?")
+            params.append(status)
+        if date_from:
+            conditions.append("e.created_at >= ?")
+            params.append(str(date_from))
+        if date_to:
+            conditions.append("e.created_at < date(?, '+1 day')")
+            params.append(str(date_to))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit_sql = f"LIMIT {int(limit)}" if limit else ""
+
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                f"""
+                SELECT e.name, e.created_at, e.metric, e.status,
+                       COUNT(g.position) AS n_groups, SUM(g.users) AS users, SUM(g.conversions) AS conversions
+                FROM experiments e LEFT JOIN experiment_groups g ON g.experiment_id = e.id
+                {where}
+                GROUP BY e.id
+                ORDER BY e.created_at DESC
+                {limit_sql}
+                """,
+                conn,
+                params=params,
+            )
+
+    def metrics(self):
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT metric FROM experiments ORDER BY metric")]
+
+    def load_groups(self, names):
+        # Группы выбранных экспериментов одной выборкой, в формате pairwise_z_test_batch
+        if not names:
+            return pd.DataFrame(columns=["Эксперимент"] + GROUP_COLUMNS)
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TEMP TABLE selected (name TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO selected VALUES (?)", [(n,) for n in names])
+            return pd.read_sql_query(
+                """
+                SELECT e.name AS "Эксперимент", g.group_name AS "Группа",
+                       g.users AS "Пользователи", g.conversions AS "Конверсии"
+                FROM selected s
+                JOIN experiments e ON e.name = s.name
+                JOIN experiment_groups g ON g.experiment_id = e.id
+                ORDER BY e.name, g.position
+                """,
+                conn,
+            )
+
+    def reanalyze(self, names):
+        return pairwise_z_test_batch(self.load_groups(names))
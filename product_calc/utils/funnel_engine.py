@@ -0,0 +1,164 @@
+# utils/funnel_engine.py
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ALL_CHANNELS = "Все каналы"
+TIME_BITS = 32  # секунды от начала лога в младших битах ключа (user << 32 | t), ~136 лет
+
+
+def parse_windows(text, n_steps):
+    # "—, 1d, 7d, 30d" -> [None, 1 день, 7 дней, 30 дней] в секундах; пусто или "—" — без ограничения
+    parts = [part.strip() for part in text.split(",")] if text.strip() else []
+    parts = (parts + [""] * n_steps)[:n_steps]
+    windows = []
+    for part in parts:
+        if part in ("", "-", "—"):
+            windows.append(None)
+        else:
+            windows.append(int(pd.Timedelta(part).total_seconds()))
+    windows[0] = None
+    return windows
+
+
+class ValueCodes:
+    # Стабильные целые коды для значений, приходящих по частям (каналы в потоке чанков)
+    def __init__(self):
+        self.values = pd.Index([])
+
+    def encode(self, values):
+        # factorize один раз по строкам, сопоставление с известными значениями — только по уникальным
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        new = pd.Index(uniques).difference(self.values)
+        if len(new):
+            self.values = self.values.append(new)
+        return self.values.get_indexer(uniques).astype(np.int32)[codes]
+
+
+def _step_index(events, steps):
+    if len(set(steps)) != len(steps):
+        raise ValueError("Шаги воронки должны быть разными событиями")
+    # Пропуски получают код -1 и попадают на добавленный в конец -1: не шаг воронки
+    codes, uniques = pd.factorize(events)
+    return np.append(pd.Index(steps).get_indexer(uniques), -1).astype(np.int8)[codes]
+
+
+def _to_seconds(timestamps):
+    return pd.to_datetime(timestamps).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+
+def funnel_users(user, step, ts, channel, windows):
+    # Строгий порядок шагов без циклов по пользователям: шаги проходятся с конца.
+    # depth события шага k — до какого шага можно дойти, начав с него: максимум depth событий шага k+1
+    # того же пользователя строго позже и не дальше окна. Поэтому раннее событие шага, обрывающее путь,
+    # не закрывает более позднее, которое его продолжает. У пользователя остаётся лучший старт (дальше всех, затем раньше).
+    # Возвращает по пользователю: сколько шагов пройдено и канал первого шага.
+    n_steps = len(windows)
+    _, user = np.unique(user, return_inverse=True)
+    user = user.astype(np.int64)
+    t0 = ts.min() if len(ts) else 0
+    rel = (ts - t0).astype(np.int64)
+    time_max = (1 << TIME_BITS) - 1
+
+    next_keys = next_depth = None
+    for k in range(n_steps - 1, -1, -1):
+        mask = step == k
+        k_user, k_t = user[mask], rel[mask]
+        keys = (k_user << TIME_BITS) | k_t
+        depth = np.full(len(keys), k + 1, dtype=np.int8)
+        if next_keys is not None and len(next_keys):
+            # События шага k+1 в (t, t + окно]: диапазон в отсортированных ключах следующего шага
+            lo = np.searchsorted(next_keys, keys, side="right")
+            limit = time_max if windows[k + 1] is None else np.minimum(k_t + windows[k + 1], time_max)
+            hi = np.searchsorted(next_keys, (k_user << TIME_BITS) | limit, side="right")
+            # Максимум depth на диапазоне: шагов мало, поэтому по префиксной сумме на каждое значение
+            for d in range(k + 2, n_steps + 1):
+                prefix = np.r_[0, np.cumsum(next_depth >= d)]
+                depth[prefix[hi] > prefix[lo]] = d
+        if k == 0:
+            break
+        order = np.argsort(keys, kind="stable")
+        next_keys, next_depth = keys[order], depth[order]
+
+    cand_user, cand_t, cand_channel, reached = k_user, k_t, channel[mask], depth
+    order = np.lexsort((cand_t, -reached, cand_user))
+    best = order[np.r_[True, cand_user[order][1:] != cand_user[order][:-1]]] if len(order) else order
+    return reached[best], cand_channel[best]
+
+
+def _count(reached, channel, n_steps, n_channels):
+    # counts[channel, k] — пользователи, дошедшие как минимум до шага k
+    counts = np.zeros((n_channels, n_steps), dtype=np.int64)
+    for k in range(n_steps):
+        counts[:, k] = np.bincount(channel[reached > k], minlength=n_channels)
+    return counts
+
+
+def _funnel_table(counts, steps, channels):
+    table = pd.DataFrame(counts, index=pd.Index(channels, name="channel"), columns=steps)
+    table.loc[ALL_CHANNELS] = table.sum()
+    return table
+
+
+def ordered_funnel(events, steps, windows=None, user_col="user_id", event_col="event",
+                   time_col="timestamp", channel_col="channel"):
+    # Воронка по логу событий в памяти: строки — каналы (канал первого шага) + "Все каналы", колонки — шаги
+    windows = windows or [None] * len(steps)
+    step = _step_index(events[event_col], steps)
+    keep = step >= 0
+    codes = ValueCodes()
+    channel = codes.encode(events[channel_col].to_numpy()[keep])
+    reached, start_channel = funnel_users(
+        events[user_col].to_numpy()[keep], step[keep], _to_seconds(events[time_col])[keep], channel, windows
+    )
+    counts = _count(reached, start_channel, len(steps), len(codes.values))
+    return _funnel_table(counts, steps, list(codes.values))
+
+
+def ordered_funnel_csv(source, steps, windows=None, chunksize=5_000_000, n_partitions=16,
+                       user_col="user_id", event_col="event", time_col="timestamp", channel_col="channel"):
+    # Потоковый вариант для логов на сотни миллионов строк: CSV читается чанками, события шагов раскладываются
+    # по n_partitions файлам на диске по хэшу пользователя, затем каждая партиция считается отдельно.
+    # В памяти одновременно только один чанк или одна партиция.
+    windows = windows or [None] * len(steps)
+    codes = ValueCodes()
+    workdir = tempfile.mkdtemp(prefix="funnel_")
+    fields = (("user", np.uint64), ("step", np.int8), ("ts", np.int64), ("channel", np.int32))
+    try:
+        reader = pd.read_csv(source, usecols=[user_col, event_col, time_col, channel_col], chunksize=chunksize)
+        for chunk in reader:
+            step = _step_index(chunk[event_col], steps)
+            keep = step >= 0
+            if not keep.any():
+                continue
+            chunk = chunk[keep]
+            columns = {
+                "user": pd.util.hash_array(chunk[user_col].to_numpy()),
+                "step": step[keep],
+                "ts": _to_seconds(chunk[time_col]),
+                "channel": codes.encode(chunk[channel_col].to_numpy()),
+            }
+            partition = columns["user"] % n_partitions
+            order = np.argsort(partition, kind="stable")
+            bounds = np.searchsorted(partition[order], np.arange(n_partitions + 1))
+            for p in range(n_partitions):
+                rows = order[bounds[p]:bounds[p + 1]]
+                if not len(rows):
+                    continue
+                for name, dtype in fields:
+                    with open(os.path.join(workdir, f"{p}.{name}"), "ab") as f:
+                        columns[name][rows].astype(dtype).tofile(f)
+
+        counts = np.zeros((max(len(codes.values), 1), len(steps)), dtype=np.int64)
+        for p in range(n_partitions):
+            if not os.path.exists(os.path.join(workdir, f"{p}.user")):
+                continue
+            data = {name: np.fromfile(os.path.join(workdir, f"{p}.{name}"), dtype=dtype) for name, dtype in fields}
+            reached, start_channel = funnel_users(data["user"], data["step"], data["ts"], data["channel"], windows)
+            counts[:len(codes.values)] += _count(reached, start_channel, len(steps), len(codes.values))
+        return _funnel_table(counts[:len(codes.values)], steps, list(codes.values))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
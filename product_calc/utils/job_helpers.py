@@ -0,0 +1,265 @@
+# utils/job_helpers.py
+# Каноническая копия. ab_test_calc/job_helpers.py и forecast_calculator_for_retail/job_helpers.py совпадают с ней
+# в коде и отличаются только комментариями и TEXTS; проверка — python benchmarks/checks.py --only job_helpers
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Общие на процесс: один кэш и одна очередь на все сессии Streamlit. Настраиваются переменными окружения.
+CACHE_MAX_MB = float(os.environ.get("CALC_CACHE_MB", 512))
+CACHE_TTL_S = float(os.environ.get("CALC_CACHE_TTL", 3600))
+WORKERS = int(os.environ.get("CALC_WORKERS", 2))
+QUEUE_MAX = int(os.environ.get("CALC_QUEUE_MAX", 32))
+
+_MISSING = object()
+
+# Тексты интерфейса — единственное, чем копии модуля отличаются в коде
+TEXTS = {
+    "queue_full": "в очереди уже {waiting} расчётов",
+    "queued": "В очереди: {position} из {total}, ожидание {waited:.1f} с",
+    "running": "Выполняется {running:.1f} с (ожидание в очереди {waited:.1f} с)",
+    "busy": "Сервер занят ({error}). Попробуйте повторить через минуту.",
+    "panel": "Очередь расчётов",
+    "panel_queued": "В очереди",
+    "panel_running": "Выполняется",
+    "panel_wait": "Ожидание (среднее / p95)",
+    "panel_wait_value": "{mean:.1f} / {p95:.1f} с",
+    "panel_cache": "Общий кэш: {entries} результатов, {mb:.1f} из {max_mb:.0f} МБ, попаданий {hit_rate}, "
+                   "вытеснено {evictions}",
+    "last_cached": "Последний расчёт ({name}): из общего кэша",
+    "last_run": "Последний расчёт ({name}): ожидание {wait_s:.1f} с, выполнение {run_s:.1f} с",
+}
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+def _feed(h, value):
+    # Нормализация входов: 1000 и 1000.0 — один ключ, float округляется до 12 значащих цифр,
+    # таблицы хэшируются по содержимому, байты файлов — целиком
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        schema = value.dtypes.to_dict() if isinstance(value, pd.DataFrame) else {value.name: value.dtype}
+        h.update(b"D" + repr(schema).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(f"A{value.dtype}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        h.update(b"B")
+        h.update(value)
+    elif isinstance(value, (bool, np.bool_)):
+        h.update(b"T" if value else b"F")
+    elif isinstance(value, (int, np.integer)):
+        h.update(f"I{int(value)}".encode())
+    elif isinstance(value, (float, np.floating)):
+        value = float(f"{float(value):.12g}")
+        h.update(f"I{int(value)}".encode() if value.is_integer() else f"F{value!r}".encode())
+    elif isinstance(value, str):
+        h.update(b"S" + value.encode())
+    elif value is None:
+        h.update(b"N")
+    elif isinstance(value, dict):
+        h.update(f"M{len(value)}".encode())
+        for k in sorted(value, key=str):
+            _feed(h, k)
+            _feed(h, value[k])
+    elif isinstance(value, (list, tuple)):
+        h.update(f"L{len(value)}".encode())
+        for item in value:
+            _feed(h, item)
+    else:
+        h.update(b"R" + repr(value).encode())
+
+
+def make_key(name, args=(), kwargs=None):
+    h = hashlib.blake2b(name.encode(), digest_size=20)
+    _feed(h, list(args))
+    _feed(h, kwargs or {})
+    return h.hexdigest()
+
+
+def _nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_nbytes(k) + _nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    # LRU с ограничением по памяти и TTL. Значения общие для всех сессий — страницы не должны их изменять.
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        _, size, _ = self._items.pop(key)
+        self.bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[2] < time.monotonic():
+                self._drop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return _MISSING
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (value, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._items), "mb": self.bytes / 2**20, "max_mb": self.max_bytes / 2**20,
+                    "hit_rate": self.hits / lookups if lookups else None, "evictions": self.evictions}
+
+
+class _Job:
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+        self.submitted = time.monotonic()
+        self.started = None
+        self.future = None
+
+
+class JobQueue:
+    # Ограниченная очередь тяжёлых расчётов: не больше workers одновременно и max_queue ожидающих.
+    # Одинаковые задачи из разных сессий не дублируются — все ждут одну и ту же.
+    def __init__(self, cache, workers, max_queue):
+        self.cache = cache
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="calc-job")
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._waiting = OrderedDict()
+        self._running = 0
+        self._waits = deque(maxlen=200)
+
+    def submit(self, key, name, func, args, kwargs):
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                return job
+            if len(self._waiting) >= self.max_queue:
+                raise QueueFull(TEXTS["queue_full"].format(waiting=len(self._waiting)))
+            job = _Job(key, name)
+            self._inflight[key] = job
+            self._waiting[key] = job
+            job.future = self._executor.submit(self._run, job, func, args, kwargs)
+            return job
+
+    def _run(self, job, func, args, kwargs):
+        with self._lock:
+            self._waiting.pop(job.key, None)
+            job.started = time.monotonic()
+            self._running += 1
+            self._waits.append(job.started - job.submitted)
+        try:
+            result = func(*args, **kwargs)
+            self.cache.put(job.key, result)
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._inflight.pop(job.key, None)
+
+    def describe(self, job):
+        with self._lock:
+            now = time.monotonic()
+            if job.started is None:
+                position = list(self._waiting).index(job.key) + 1 if job.key in self._waiting else 1
+                return TEXTS["queued"].format(position=position, total=len(self._waiting), waited=now - job.submitted)
+            return TEXTS["running"].format(running=now - job.started, waited=job.started - job.submitted)
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            return {"waiting": len(self._waiting), "running": self._running, "workers": self.workers,
+                    "max_queue": self.max_queue, "wait_mean_s": waits.mean(), "wait_p95_s": np.percentile(waits, 95)}
+
+
+CACHE = ResultCache(int(CACHE_MAX_MB * 2**20), CACHE_TTL_S)
+QUEUE = JobQueue(CACHE, WORKERS, QUEUE_MAX)
+
+
+def run_job(name, func, *args, **kwargs):
+    # Результат из общего кэша, иначе расчёт через очередь; пока ждём — позиция и время ожидания на странице.
+    # func выполняется в рабочем потоке и не должна вызывать st.*
+    key = make_key(name, args, kwargs)
+    value = CACHE.get(key)
+    if value is not _MISSING:
+        st.session_state["_job_last"] = {"name": name, "cached": True, "wait_s": 0.0, "run_s": 0.0}
+        return value
+
+    try:
+        job = QUEUE.submit(key, name, func, args, kwargs)
+    except QueueFull as e:
+        st.warning(TEXTS["busy"].format(error=e))
+        st.stop()
+
+    status = st.empty()
+    while not wait([job.future], timeout=0.25).done:
+        status.caption(QUEUE.describe(job))
+    status.empty()
+    result = job.future.result()
+
+    finished = time.monotonic()
+    started = job.started or finished
+    st.session_state["_job_last"] = {"name": name, "cached": False, "wait_s": started - job.submitted,
+                                     "run_s": finished - started}
+    return result
+
+
+def job_panel():
+    with st.expander(TEXTS["panel"], expanded=False):
+        queue, cache = QUEUE.stats(), CACHE.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric(TEXTS["panel_queued"], f"{queue['waiting']} / {queue['max_queue']}")
+        col2.metric(TEXTS["panel_running"], f"{queue['running']} / {queue['workers']}")
+        col3.metric(TEXTS["panel_wait"], TEXTS["panel_wait_value"].format(mean=queue["wait_mean_s"],
+                                                                         p95=queue["wait_p95_s"]))
+        hit_rate = "—" if cache["hit_rate"] is None else f"{cache['hit_rate']:.0%}"
+        st.caption(TEXTS["panel_cache"].format(entries=cache["entries"], mb=cache["mb"], max_mb=cache["max_mb"],
+                                               hit_rate=hit_rate, evictions=cache["evictions"]))
+        last = st.session_state.get("_job_last")
+        if last:
+            if last["cached"]:
+                st.caption(TEXTS["last_cached"].format(name=last["name"]))
+            else:
+                st.caption(TEXTS["last_run"].format(**last))
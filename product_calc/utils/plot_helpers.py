@@ -0,0 +1,72 @@
+# utils/plot_helpers.py
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Выше этого числа ячеек подписи в heatmap не рисуются
+ANNOT_MAX_CELLS = 400
+# Выше этого размера матрица усредняется блоками перед отрисовкой
+HEATMAP_MAX_ROWS = 60
+HEATMAP_MAX_COLS = 60
+# Выше этого числа ячеек вместо matplotlib используется интерактивный Plotly
+PLOTLY_MIN_CELLS = 5000
+
+
+def show_figure(fig):
+    # Отрисовать фигуру и сразу освободить её, чтобы pyplot не копил фигуры между rerun
+    import matplotlib.pyplot as plt
+
+    st.pyplot(fig)
+    plt.close(fig)
+
+
+def downsample_matrix(df, max_rows=HEATMAP_MAX_ROWS, max_cols=HEATMAP_MAX_COLS):
+    # Усреднение блоками: подпись блока берётся от первой строки/колонки
+    n_rows, n_cols = df.shape
+    row_step = int(np.ceil(n_rows / max_rows)) if n_rows > max_rows else 1
+    col_step = int(np.ceil(n_cols / max_cols)) if n_cols > max_cols else 1
+    if row_step == 1 and col_step == 1:
+        return df
+
+    values = df.to_numpy(dtype=float)
+    row_bins = np.arange(n_rows) // row_step
+    col_bins = np.arange(n_cols) // col_step
+    pooled = pd.DataFrame(values).groupby(row_bins).mean().T.groupby(col_bins).mean().T
+    pooled.index = df.index[::row_step]
+    pooled.columns = df.columns[::col_step]
+    return pooled
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def render_heatmap_png(df, fmt=".0%", cmap="Blues", figsize=(12, 6)):
+    # matplotlib и seaborn подгружаются только при первой отрисовке
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    data = downsample_matrix(df)
+    annot = data.size <= ANNOT_MAX_CELLS
+
+    fig, ax = plt.subplots(figsize=figsize)
+    sns.heatmap(data, annot=annot, fmt=fmt, cmap=cmap, ax=ax)
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_plotly_heatmap(df, cmap="Blues"):
+    import plotly.express as px
+
+    data = downsample_matrix(df, max_rows=500, max_cols=500)
+    return px.imshow(data, color_continuous_scale=cmap, aspect="auto")
+
+
+def heatmap(df, fmt=".0%", cmap="Blues", figsize=(12, 6)):
+    # Небольшие матрицы — статичный PNG с подписями, большие — интерактивный Plotly без подписей
+    if df.size >= PLOTLY_MIN_CELLS:
+        st.plotly_chart(build_plotly_heatmap(df, cmap=cmap), use_container_width=True)
+    else:
+        st.image(render_heatmap_png(df, fmt=fmt, cmap=cmap, figsize=figsize), use_container_width=True)
@@ -0,0 +1,129 @@
+# utils/retention_index.py
+import numpy as np
+import pandas as pd
+
+WORD_BITS = 64
+
+
+def parse_brackets(text):
+    # "0-1, 1-7, 7-30, 30+" -> [(0, 1), (1, 7), (7, 30), (30, None)]; границы в днях с установки, конец не включается
+    brackets = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if part.endswith("+"):
+                start, end = int(part[:-1]), None
+            else:
+                start, end = (int(value) for value in part.split("-"))
+        except ValueError:
+            raise ValueError(f"Не удалось разобрать интервал «{part}»: ожидается «начало-конец» или «начало+»") from None
+        if start < 0 or (end is not None and end <= start):
+            raise ValueError(f"Интервал «{part}» пустой или начинается до дня установки")
+        brackets.append((start, end))
+    if not brackets:
+        raise ValueError("Не задано ни одного интервала")
+    return brackets
+
+
+def _bit_values(days):
+    return np.left_shift(np.uint64(1), (days % WORD_BITS).astype(np.uint64))
+
+
+class ActivityIndex:
+    # Битовая карта активности: у каждого пользователя бит d установлен, если он был активен на d-й день после установки.
+    # Дни упакованы в uint64 (users × words), любые определения retention — это AND с маской окна и any() по словам.
+    def __init__(self, bits, install_day, observed_days):
+        self.bits = bits
+        self.install_day = install_day
+        self.observed_days = observed_days
+        self.max_days = bits.shape[1] * WORD_BITS
+        self._cohorts = {}
+
+    @classmethod
+    def from_events(cls, df, user_col="user_id", install_col="install_date", event_col="event_date", max_days=None):
+        codes, _ = pd.factorize(df[user_col])
+        install = df[install_col].to_numpy().astype("datetime64[D]").astype(np.int64)
+        event = df[event_col].to_numpy().astype("datetime64[D]").astype(np.int64)
+
+        # Дата установки пользователя — самая ранняя из встреченных в логе
+        install_day = pd.Series(install).groupby(codes).min().to_numpy()
+        offset = event - install_day[codes]
+        if max_days is None:
+            max_days = int(offset.max()) + 1 if len(offset) else 1
+        n_words = max((max_days + WORD_BITS - 1) // WORD_BITS, 1)
+        valid = (offset >= 0) & (offset < max_days)
+        offset = offset[valid]
+
+        # OR битов одного слова: сортировка по (пользователь, слово) и bitwise_or.reduceat без циклов по пользователям
+        key = codes[valid].astype(np.int64) * n_words + offset // WORD_BITS
+        bit = _bit_values(offset)
+        order = np.argsort(key, kind="stable")
+        key, bit = key[order], bit[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.array([], dtype=np.int64)
+
+        bits = np.zeros(len(install_day) * n_words, dtype=np.uint64)
+        if len(key):
+            bits[key[starts]] = np.bitwise_or.reduceat(bit, starts)
+        observed_days = int(event.max()) - install_day if len(event) else np.zeros_like(install_day)
+        return cls(bits.reshape(len(install_day), n_words), install_day, observed_days)
+
+    @property
+    def n_users(self):
+        return self.bits.shape[0]
+
+    def _window_mask(self, start, end):
+        days = np.arange(start, end)
+        mask = np.zeros(self.bits.shape[1], dtype=np.uint64)
+        np.bitwise_or.at(mask, days // WORD_BITS, _bit_values(days))
+        return mask
+
+    def active_between(self, start, end=None):
+        # Был ли пользователь активен хотя бы в один день из [start, end); end=None — до конца наблюдений
+        end = self.max_days if end is None else min(end, self.max_days)
+        if start >= end:
+            return np.zeros(self.n_users, dtype=bool)
+        first, last = start // WORD_BITS, (end - 1) // WORD_BITS + 1
+        mask = self._window_mask(start, end)[first:last]
+        return (self.bits[:, first:last] & mask).any(axis=1)
+
+    def cohorts(self, freq="D"):
+        # Когорта пользователя — период установки (день, неделя или месяц)
+        if freq not in self._cohorts:
+            install = pd.Series(self.install_day.astype("datetime64[D]").astype("datetime64[ns]"))
+            periods = install.dt.to_period(freq).dt.start_time
+            codes, labels = pd.factorize(periods, sort=True)
+            self._cohorts[freq] = (codes, pd.Index(labels, name="install_period"))
+        return self._cohorts[freq]
+
+    def retention(self, windows, freq="D", columns=None):
+        # Доля пользователей когорты, активных в каждом окне; в знаменателе только те, для кого окно уже наблюдаемо
+        codes, labels = self.cohorts(freq)
+        result = {}
+        for i, (start, end) in enumerate(windows):
+            active = self.active_between(start, end)
+            eligible = self.observed_days >= (start if end is None else end - 1)
+            hits = np.bincount(codes, weights=active & eligible, minlength=len(labels))
+            base = np.bincount(codes, weights=eligible, minlength=len(labels))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result[columns[i] if columns else i] = np.where(base > 0, hits / base, np.nan)
+        return pd.DataFrame(result, index=labels)
+
+    def classic(self, period_days, n_periods, freq="D"):
+        # Активен в периоде k: дни [k * period, (k + 1) * period)
+        windows = [(k * period_days, (k + 1) * period_days) for k in range(n_periods)]
+        return self.retention(windows, freq, columns=list(range(n_periods)))
+
+    def rolling(self, period_days, n_periods, freq="D"):
+        # Rolling / unbounded: вернулся в период k или позже
+        windows = [(k * period_days, None) for k in range(n_periods)]
+        return self.retention(windows, freq, columns=list(range(n_periods)))
+
+    def bracket(self, brackets, freq="D"):
+        columns = [f"{start}+" if end is None else f"{start}-{end}" for start, end in brackets]
+        return self.retention(brackets, freq, columns=columns)
+
+    def cohort_sizes(self, freq="D"):
+        codes, labels = self.cohorts(freq)
+        return pd.Series(np.bincount(codes, minlength=len(labels)), index=labels, name="users")